@@ -0,0 +1,150 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker over a rolling window of recent calls.
+    
+    The circuit opens when, over at least min_calls of the last window
+    calls, the failure rate or the slow-call rate reaches its threshold.
+    While open every call is rejected; after open_seconds a few probe calls
+    are let through (half-open). If they all succeed the circuit closes,
+    and any failed or slow probe opens it again.
+    
+    Every state change starts a new epoch. allow() hands out the current
+    one and record() ignores calls from an earlier epoch, so a slow call
+    made while closed can't count as a half-open probe.
+    """
+    
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        slow_call_rate: float,
+        open_seconds: float,
+        half_open_calls: int
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._calls = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._epoch = 0
+        self._probes = 0
+        self._probe_successes = 0
+    
+    def retry_after(self) -> float:
+        """Seconds until an open circuit starts probing again."""
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+    
+    def allow(self) -> Optional[int]:
+        """The epoch to record a call under, or None if it may not go to the upstream now."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return None
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+            self._probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                return None
+            self._probes += 1
+        return self._epoch
+    
+    def cancel(self, epoch: int):
+        """Give back a call allow() let through that was never made."""
+        if epoch == self._epoch and self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+    
+    def record(self, epoch: int, success: bool, duration: float):
+        """Record the outcome of a call that allow() let through."""
+        if epoch != self._epoch:
+            return  # started before the last state change
+        slow = duration >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if not success or slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._set_state(CLOSED)
+                self._calls.clear()
+            return
+        
+        self._calls.append((not success, slow))
+        if len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow_calls = sum(1 for _, was_slow in self._calls if was_slow)
+        if (failures / len(self._calls) >= self.failure_rate
+                or slow_calls / len(self._calls) >= self.slow_call_rate):
+            self._open()
+    
+    def _set_state(self, state: str):
+        self.state = state
+        self._epoch += 1
+    
+    def _open(self):
+        self._set_state(OPEN)
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+    
+    def snapshot(self) -> dict:
+        return {"state": self.state, "recent_calls": len(self._calls)}
+
+
+class Bulkhead:
+    """Cap on concurrent calls to one upstream; waits briefly, then rejects."""
+    
+    def __init__(self, max_concurrent: int, wait_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.wait_timeout = wait_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+    
+    async def acquire(self) -> bool:
+        """Take a slot; False if none freed up within wait_timeout."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.in_flight += 1
+        return True
+    
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+    
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "max_concurrent": self.max_concurrent}
+
+
+class UpstreamGuard:
+    """Circuit breaker and bulkhead guarding one upstream."""
+    
+    def __init__(self, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.rejected: int = 0
+        self.last_error: Optional[str] = None
+    
+    def snapshot(self) -> dict:
+        return {
+            **self.breaker.snapshot(),
+            **self.bulkhead.snapshot(),
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
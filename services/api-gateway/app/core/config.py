@@ -0,0 +1,61 @@
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    # Upstream services
+    AUTH_SERVICE_URL: str = "http://auth-service:8000"
+    DRIVER_SERVICE_URL: str = "http://driver-service:8000"
+    COMPANY_SERVICE_URL: str = "http://company-service:8000"
+    
+    # Upstream HTTP clients (one pooled client per upstream)
+    UPSTREAM_MAX_CONNECTIONS: int = 100  # per upstream
+    UPSTREAM_MAX_KEEPALIVE: int = 20  # idle connections kept open per upstream
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    UPSTREAM_CONNECT_TIMEOUT: float = 2.0
+    UPSTREAM_POOL_TIMEOUT: float = 2.0  # seconds to wait for a free connection
+    UPSTREAM_HTTP2: bool = False  # needs httpx[http2]; negotiated over TLS only
+    # Read/write timeouts per upstream
+    AUTH_SERVICE_TIMEOUT: float = 10.0
+    DRIVER_SERVICE_TIMEOUT: float = 10.0
+    COMPANY_SERVICE_TIMEOUT: float = 10.0
+    
+    # Circuit breaker and bulkhead per upstream
+    UPSTREAM_MAX_CONCURRENCY: int = 100  # calls in flight per upstream
+    UPSTREAM_BULKHEAD_WAIT: float = 0.1  # seconds to wait for a free slot before 503
+    BREAKER_WINDOW: int = 50  # recent calls considered
+    BREAKER_MIN_CALLS: int = 20  # calls needed before the circuit can open
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 2.0
+    BREAKER_SLOW_CALL_RATE: float = 0.5
+    BREAKER_OPEN_SECONDS: float = 10.0  # before half-open probing
+    BREAKER_HALF_OPEN_CALLS: int = 3  # successful probes needed to close
+    
+    # Edge JWT verification (same secret and algorithm as auth-service)
+    EDGE_AUTH_ENABLED: bool = False
+    SECRET_KEY: str = ""
+    ALGORITHM: str = "HS256"
+    AUTH_CACHE_SIZE: int = 10000  # verified tokens kept, each until its exp
+    # Signed identity header for upstreams; services need the same key
+    INTERNAL_AUTH_KEY: str = ""
+    INTERNAL_IDENTITY_TTL: int = 30  # seconds a signed identity stays valid
+    
+    # Redis (shared response cache tier and invalidation events)
+    REDIS_HOST: str = "redis"
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 20
+    
+    # Response cache for GET routes marked cacheable
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL: float = 10.0  # seconds a response is served as fresh
+    RESPONSE_CACHE_STALE: float = 30.0  # further seconds served stale while revalidating
+    RESPONSE_CACHE_SIZE: int = 5000  # entries kept in memory
+    RESPONSE_CACHE_MAX_BODY: int = 1048576  # larger responses are not cached
+    RESPONSE_CACHE_REDIS: bool = False  # also share entries between gateways via Redis
+    DRIVER_EVENTS_CHANNEL: str = "driver_events"  # published by driver-service
+    
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
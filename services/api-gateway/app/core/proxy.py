@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import math
+import time
+from urllib.parse import quote
+from typing import List, Optional, Type
+
+import httpx
+from fastapi import APIRouter, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
+
+from app.core.response_cache import CachedResponse, cache_key, response_cache
+from app.core.responses import ORJSONResponse
+from app.core.security import INTERNAL_IDENTITY_HEADER, AuthError, edge_auth
+from app.core.upstreams import upstreams
+
+# Connection-level headers that must not be forwarded by a proxy
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host",
+}
+# The gateway's own server sets these on every response
+GATEWAY_RESPONSE_HEADERS = {"date", "server"}
+# Only the gateway may assert an identity to upstreams
+REQUEST_SKIP_HEADERS = HOP_BY_HOP_HEADERS | {INTERNAL_IDENTITY_HEADER}
+RESPONSE_SKIP_HEADERS = HOP_BY_HOP_HEADERS | GATEWAY_RESPONSE_HEADERS
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream can't be called now; becomes a 503."""
+    
+    def __init__(self, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Route:
+    """
+    One gateway route: a public path proxied to a path on an upstream.
+    
+    Path parameters in the public path ({company_id:uuid}) are escaped and
+    substituted into upstream_path ({company_id}). With a schema, the request body is validated at the edge
+    before it is forwarded unchanged; without one it is streamed through
+    untouched. auth_required rejects requests without a bearer token and,
+    with edge auth on, verifies the token before anything is forwarded.
+    GET responses of routes with a cache_tag (e.g. "company:{company_id}")
+    go through the response cache, which that tag invalidates.
+    """
+    
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        upstream: str,
+        upstream_path: str,
+        schema: Optional[Type[BaseModel]] = None,
+        auth_required: bool = False,
+        summary: Optional[str] = None,
+        cache_tag: Optional[str] = None
+    ):
+        self.method = method
+        self.path = path
+        self.upstream = upstream
+        self.upstream_path = upstream_path
+        self.schema = schema
+        self.auth_required = auth_required
+        self.summary = summary
+        self.cache_tag = cache_tag
+
+
+def _path_params(request: Request) -> dict:
+    """Path parameters escaped so they can't add segments or a query upstream."""
+    return {name: quote(str(value), safe="") for name, value in request.path_params.items()}
+
+
+def _forward_headers(headers, skip=HOP_BY_HOP_HEADERS) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in skip}
+
+
+async def proxy(request: Request, route: Route):
+    """Forward a request to the route's upstream and stream the response back."""
+    headers = _forward_headers(request.headers, REQUEST_SKIP_HEADERS)
+    authorization = request.headers.get("authorization", "")
+    identity = hashlib.sha256(authorization.encode()).hexdigest() if authorization else ""
+    if route.auth_required:
+        if not authorization.lower().startswith("bearer "):
+            return ORJSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Not authenticated"})
+        if edge_auth.enabled:
+            try:
+                user_id, exp = edge_auth.verify(authorization[7:].strip())
+            except AuthError as e:
+                return ORJSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": e.detail})
+            identity = f"user:{user_id}"
+            signed = edge_auth.identity_header(user_id, exp)
+            if signed is not None:
+                headers[INTERNAL_IDENTITY_HEADER] = signed
+    
+    if route.cache_tag is not None and request.method == "GET" and response_cache.enabled:
+        return await _cached(request, route, headers, identity)
+    
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    body = request.stream() if has_body else None
+    if route.schema is not None:
+        # Validate the raw bytes; the same bytes are forwarded, not a re-serialized model
+        body = await request.body()
+        if not body:
+            return _invalid_body([{"type": "missing", "loc": [], "msg": "Field required", "input": None}])
+        try:
+            route.schema.model_validate_json(body)
+        except ValidationError as e:
+            return _invalid_body(e.errors(include_url=False, include_context=False))
+    
+    upstream_request = upstreams.get(route.upstream).build_request(
+        request.method,
+        route.upstream_path.format(**_path_params(request)),
+        params=request.url.query or None,
+        headers=headers,
+        content=body
+    )
+    try:
+        response = await _send(route, upstream_request)
+    except UpstreamUnavailable as e:
+        return _unavailable(e.detail, e.retry_after)
+    
+    closed = False
+    
+    async def close():
+        nonlocal closed
+        if not closed:
+            closed = True
+            await response.aclose()
+            upstreams.guard(route.upstream).bulkhead.release()
+    
+    async def stream():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            # Also runs when the client goes away mid-stream
+            await close()
+    
+    # Raw bytes still carry the upstream content-encoding, so its headers stay valid
+    return StreamingResponse(
+        stream(),
+        status_code=response.status_code,
+        headers=_forward_headers(response.headers, RESPONSE_SKIP_HEADERS),
+        background=BackgroundTask(close)
+    )
+
+
+async def _send(route: Route, upstream_request: httpx.Request) -> httpx.Response:
+    """
+    Send through the upstream's circuit breaker and bulkhead.
+    
+    The response is streamed; the caller must close it and release the
+    bulkhead slot. Raises UpstreamUnavailable instead of calling an upstream
+    that is known to be unhealthy or saturated.
+    """
+    service = f"{route.upstream.capitalize()} service"
+    guard = upstreams.guard(route.upstream)
+    
+    epoch = guard.breaker.allow()
+    if epoch is None:
+        guard.rejected += 1
+        raise UpstreamUnavailable(f"{service} unavailable: circuit open", guard.breaker.retry_after())
+    if not await guard.bulkhead.acquire():
+        guard.rejected += 1
+        guard.breaker.cancel(epoch)
+        raise UpstreamUnavailable(f"{service} busy: too many concurrent requests", 1)
+    
+    started = time.monotonic()
+    try:
+        response = await upstreams.get(route.upstream).send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        guard.bulkhead.release()
+        guard.breaker.record(epoch, False, time.monotonic() - started)
+        guard.last_error = str(e) or type(e).__name__
+        raise UpstreamUnavailable(f"{service} unavailable: {e}")
+    except asyncio.CancelledError:
+        # The client went away mid-call; the slot must not leak
+        guard.bulkhead.release()
+        guard.breaker.cancel(epoch)
+        raise
+    guard.breaker.record(epoch, response.status_code < 500, time.monotonic() - started)
+    return response
+
+
+async def _cached(request: Request, route: Route, headers: dict, identity: str) -> Response:
+    """Serve a GET from the response cache, fetching from the upstream on a miss."""
+    params = _path_params(request)
+    path = route.upstream_path.format(**params)
+    query = request.url.query
+    # Cached bodies are shared by every client, so never store an encoded one
+    headers.pop("accept-encoding", None)
+    
+    async def fetch() -> CachedResponse:
+        client = upstreams.get(route.upstream)
+        response = await _send(route, client.build_request("GET", path, params=query or None, headers=headers))
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+            upstreams.guard(route.upstream).bulkhead.release()
+        return CachedResponse(response.status_code, _forward_headers(response.headers, RESPONSE_SKIP_HEADERS), body)
+    
+    try:
+        cached, outcome = await response_cache.get(
+            cache_key(identity, path, query),
+            [route.cache_tag.format(**params)],
+            fetch
+        )
+    except UpstreamUnavailable as e:
+        return _unavailable(e.detail, e.retry_after)
+    return Response(cached.body, status_code=cached.status_code, headers={**cached.headers, "x-cache": outcome})
+
+
+def _invalid_body(errors: list) -> ORJSONResponse:
+    """A 422 shaped like FastAPI's own request validation errors."""
+    # Errors on malformed JSON carry the raw bytes as input
+    detail = [{**error, "loc": ["body", *error["loc"]]} for error in jsonable_encoder(errors)]
+    return ORJSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": detail})
+
+
+def _unavailable(detail: str, retry_after: Optional[float] = None) -> ORJSONResponse:
+    headers = {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": detail},
+        headers=headers
+    )
+
+
+def build_router(prefix: str, tags: List[str], routes: List[Route]) -> APIRouter:
+    """An APIRouter that proxies every route in the table."""
+    router = APIRouter(prefix=prefix, tags=tags)
+    for route in routes:
+        router.add_api_route(
+            route.path,
+            _endpoint(route),
+            methods=[route.method],
+            summary=route.summary,
+            openapi_extra=_openapi_body(route.schema)
+        )
+    return router
+
+
+def _endpoint(route: Route):
+    async def endpoint(request: Request):
+        return await proxy(request, route)
+    return endpoint
+
+
+def _openapi_body(schema: Optional[Type[BaseModel]]) -> Optional[dict]:
+    if schema is None:
+        return None
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": schema.model_json_schema()}}
+        }
+    }
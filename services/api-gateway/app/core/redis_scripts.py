@@ -0,0 +1,28 @@
+from app.core.redis_client import redis_conn
+
+
+# Store a cached response in the shared tier only if none of its tags were
+# invalidated since the fetch started, so a slow refresh on one gateway
+# can't put back a body another gateway just invalidated.
+# KEYS: entry hash, then one generation counter per tag, then one key set per tag
+# ARGV: retention seconds, status, headers JSON, body, stored_at,
+#       then the generation seen for each tag before the fetch
+# Returns 1 if stored, 0 if a tag's generation had moved on.
+STORE_CACHED_RESPONSE = """
+local tags = (#KEYS - 1) / 2
+for i = 1, tags do
+    if (redis.call('GET', KEYS[1 + i]) or '0') ~= ARGV[5 + i] then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[2], 'headers', ARGV[3], 'body', ARGV[4], 'stored_at', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+for i = 1, tags do
+    local tag_set = KEYS[1 + tags + i]
+    redis.call('SADD', tag_set, KEYS[1])
+    redis.call('EXPIRE', tag_set, ARGV[1])
+end
+return 1
+"""
+
+store_cached_response_script = redis_conn.register_script(STORE_CACHED_RESPONSE)
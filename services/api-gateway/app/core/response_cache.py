@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.core.redis_client import redis_conn, decode_val
+from app.core.redis_scripts import store_cached_response_script
+
+CACHE_KEY_PREFIX = "gw_cache:"
+CACHE_TAG_PREFIX = "gw_cache_tag:"
+# Per-tag invalidation counter shared by every gateway
+CACHE_GENERATION_PREFIX = "gw_cache_gen:"
+
+
+class CachedResponse:
+    """A fully buffered upstream response."""
+    
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, stored_at: Optional[float] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.stored_at = time.time() if stored_at is None else stored_at
+    
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+def cache_key(identity: str, path: str, query: str) -> str:
+    """Entries are per caller, so one identity never sees another's response."""
+    return hashlib.sha256(f"{identity}\n{path}\n{query}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of upstream GET responses, in memory with an optional Redis tier.
+    
+    An entry is fresh for ttl seconds. For stale seconds after that it is
+    still served, while one background request refreshes it
+    (stale-while-revalidate); older entries are misses. Concurrent misses
+    for the same key wait on a single upstream call. Entries carry tags
+    such as company:{id}, and invalidate(tag) drops every entry with that
+    tag; driver-service publishes the events that trigger it. Each tag has
+    a generation counter, locally and in Redis, that invalidation bumps; a
+    refresh whose tags moved on while it was in flight isn't stored.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, stale: float, max_body: int, use_redis: bool):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale = stale
+        self.max_body = max_body
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._entry_tags: Dict[str, List[str]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        # Bumped on invalidation, so a fetch that started before it isn't stored
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0, "stale": 0, "misses": 0, "coalesced": 0,
+            "invalidations": 0, "refresh_errors": 0, "redis_errors": 0,
+            "stale_writes_rejected": 0,
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.RESPONSE_CACHE_ENABLED
+    
+    async def get(
+        self,
+        key: str,
+        tags: List[str],
+        fetch: Callable[[], Awaitable[CachedResponse]]
+    ) -> Tuple[CachedResponse, str]:
+        """The response for key and whether it was a "hit", "stale" or "miss"."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.use_redis:
+            entry = await self._redis_get(key)
+            if entry is not None:
+                self._store(key, tags, entry)
+        
+        if entry is not None and entry.age() < self.ttl:
+            self.stats["hits"] += 1
+            return entry, "hit"
+        if entry is not None and entry.age() < self.ttl + self.stale:
+            self.stats["stale"] += 1
+            if key not in self._inflight:
+                self._fetch(key, tags, fetch)
+            return entry, "stale"
+        
+        self.stats["misses"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._fetch(key, tags, fetch)
+        else:
+            self.stats["coalesced"] += 1
+        # A waiter going away must not cancel the call the others wait on
+        return await asyncio.shield(task), "miss"
+    
+    def _fetch(self, key: str, tags: List[str], fetch) -> asyncio.Task:
+        task = asyncio.create_task(self._refresh(key, tags, fetch))
+        self._inflight[key] = task
+        
+        def done(finished: asyncio.Task):
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            # Waiters get the error themselves; this covers background refreshes
+            if not finished.cancelled() and finished.exception() is not None:
+                self.stats["refresh_errors"] += 1
+        
+        task.add_done_callback(done)
+        return task
+    
+    async def _refresh(self, key: str, tags: List[str], fetch) -> CachedResponse:
+        generations = [self._generations.get(tag, 0) for tag in tags]
+        shared_generations = await self._redis_generations(tags) if self.use_redis else None
+        response = await fetch()
+        if response.status_code != 200 or len(response.body) > self.max_body:
+            return response
+        if generations != [self._generations.get(tag, 0) for tag in tags]:
+            return response  # invalidated while in flight
+        self._store(key, tags, response)
+        if shared_generations is not None:
+            await self._redis_set(key, tags, response, shared_generations)
+        return response
+    
+    def _store(self, key: str, tags: List[str], entry: CachedResponse):
+        self._drop(key)
+        self._entries[key] = entry
+        self._entry_tags[key] = tags
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+    
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+    
+    async def _redis_get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = await redis_conn.hgetall(CACHE_KEY_PREFIX + key)
+        except Exception:
+            self.stats["redis_errors"] += 1
+            return None
+        if not raw:
+            return None
+        fields = {decode_val(k): v for k, v in raw.items()}
+        return CachedResponse(
+            int(fields["status"]),
+            orjson.loads(fields["headers"]),
+            fields["body"],
+            float(fields["stored_at"])
+        )
+    
+    async def _redis_generations(self, tags: List[str]) -> Optional[List[str]]:
+        """Shared generation of each tag; None if Redis can't be read."""
+        if not tags:
+            return []
+        try:
+            values = await redis_conn.mget([CACHE_GENERATION_PREFIX + tag for tag in tags])
+        except Exception:
+            self.stats["redis_errors"] += 1
+            return None
+        return [decode_val(value) or "0" for value in values]
+    
+    async def _redis_set(self, key: str, tags: List[str], entry: CachedResponse, generations: List[str]):
+        """Share an entry, unless another gateway invalidated one of its tags meanwhile."""
+        try:
+            stored = await store_cached_response_script(
+                keys=[
+                    CACHE_KEY_PREFIX + key,
+                    *[CACHE_GENERATION_PREFIX + tag for tag in tags],
+                    *[CACHE_TAG_PREFIX + tag for tag in tags],
+                ],
+                args=[
+                    math.ceil(self.ttl + self.stale),
+                    entry.status_code,
+                    orjson.dumps(entry.headers),
+                    entry.body,
+                    entry.stored_at,
+                    *generations,
+                ]
+            )
+        except Exception:
+            self.stats["redis_errors"] += 1
+            return
+        if not stored:
+            self.stats["stale_writes_rejected"] += 1
+    
+    async def invalidate(self, tag: str):
+        """Drop every entry tagged with tag, here and in Redis."""
+        self.stats["invalidations"] += 1
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        for key in list(self._tags.get(tag, ())):
+            self._drop(key)
+        if not self.use_redis:
+            return
+        tag_key = CACHE_TAG_PREFIX + tag
+        try:
+            # Bump the shared generation first, so refreshes already in flight
+            # on any gateway can no longer write the old body back
+            await redis_conn.incr(CACHE_GENERATION_PREFIX + tag)
+            keys = await redis_conn.smembers(tag_key)
+            await redis_conn.delete(tag_key, *keys)
+        except Exception:
+            self.stats["redis_errors"] += 1
+    
+    def clear(self):
+        """Drop every in-memory entry."""
+        for tag in self._tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        self._entries.clear()
+        self._entry_tags.clear()
+        self._tags.clear()
+    
+    async def handle_event(self, data: str):
+        """Invalidate what a driver-service write event makes stale."""
+        event = orjson.loads(data)
+        company_id = event.get("company_id")
+        if company_id:
+            await self.invalidate(f"company:{company_id}")
+    
+    async def _listen(self):
+        while True:
+            pubsub = redis_conn.pubsub()
+            try:
+                await pubsub.subscribe(settings.DRIVER_EVENTS_CHANNEL)
+                print(f"✅ Response cache subscribed to {settings.DRIVER_EVENTS_CHANNEL}")
+                async for msg in pubsub.listen():
+                    if msg["type"] != "message":
+                        continue
+                    try:
+                        await self.handle_event(decode_val(msg["data"]))
+                    except ValueError as e:
+                        print(f"⚠️ Bad driver event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Events may have been missed meanwhile, so nothing local can be trusted
+                self.clear()
+                print(f"❌ Response cache invalidation listener failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+    
+    def start(self):
+        """Start listening for invalidation events."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        """Stop the listener and any background refreshes."""
+        tasks = list(self._inflight.values())
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "redis": self.use_redis,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            **self.stats,
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_SIZE,
+    settings.RESPONSE_CACHE_TTL,
+    settings.RESPONSE_CACHE_STALE,
+    settings.RESPONSE_CACHE_MAX_BODY,
+    settings.RESPONSE_CACHE_REDIS
+)
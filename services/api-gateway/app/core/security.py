@@ -0,0 +1,135 @@
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import jwt
+
+from app.core.config import settings
+
+# Verified identity the gateway passes to upstreams; never taken from clients
+INTERNAL_IDENTITY_HEADER = "x-gateway-identity"
+
+
+class AuthError(Exception):
+    """A bearer token the gateway refuses; detail matches the services' own errors."""
+    
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def sign_identity(user_id: str, expires: int, key: str) -> str:
+    """Internal identity header value: user_id.expires.signature."""
+    message = f"{user_id}.{expires}"
+    signature = hmac.new(key.encode(), message.encode(), hashlib.sha256).hexdigest()
+    return f"{message}.{signature}"
+
+
+class ClaimCache:
+    """
+    LRU cache of verified token claims, keyed by a hash of the token.
+    
+    An entry is only ever added after the signature has been checked, and
+    it is dropped once the token's own exp passes, so a hit is exactly as
+    trustworthy as decoding the token again. Raw tokens are not kept.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, token: str) -> Optional[Tuple[str, float]]:
+        """(user_id, exp) for a cached, unexpired token."""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def put(self, token: str, user_id: str, exp: float):
+        key = self._key(token)
+        self._entries[key] = (user_id, exp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def snapshot(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class EdgeAuth:
+    """
+    Verify bearer tokens at the gateway, once per token.
+    
+    Decoded claims are cached until the token expires, so repeat requests
+    with the same token skip the JWT decode. The caller's identity is then
+    sent upstream in a short-lived HMAC-signed header, which driver-service
+    and company-service accept instead of decoding the token themselves.
+    """
+    
+    def __init__(self, cache: ClaimCache):
+        self.cache = cache
+        self.rejected = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.EDGE_AUTH_ENABLED
+    
+    def check_config(self):
+        """Refuse to start with edge auth on but nothing to verify tokens with."""
+        if self.enabled and not settings.SECRET_KEY:
+            raise RuntimeError("EDGE_AUTH_ENABLED is set but SECRET_KEY is empty")
+    
+    def verify(self, token: str) -> Tuple[str, float]:
+        """(user_id, exp) for a valid token; raises AuthError otherwise."""
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            self.rejected += 1
+            raise AuthError("Token expired")
+        except jwt.PyJWTError:
+            # Any other PyJWT failure (bad key, unsupported algorithm) is still a rejection
+            self.rejected += 1
+            raise AuthError("Invalid token")
+        
+        user_id = payload.get("user_id")
+        if not user_id:
+            self.rejected += 1
+            raise AuthError("Invalid token payload")
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            self.cache.put(token, str(user_id), exp)
+        else:
+            # Without exp there is nothing to bound the entry by
+            exp = time.time() + settings.INTERNAL_IDENTITY_TTL
+        return str(user_id), exp
+    
+    def identity_header(self, user_id: str, exp: float) -> Optional[str]:
+        """Signed identity for upstreams, or None when no internal key is set."""
+        if not settings.INTERNAL_AUTH_KEY:
+            return None
+        expires = int(min(exp, time.time() + settings.INTERNAL_IDENTITY_TTL))
+        return sign_identity(user_id, expires, settings.INTERNAL_AUTH_KEY)
+    
+    def snapshot(self) -> dict:
+        return {"enabled": self.enabled, "rejected": self.rejected, **self.cache.snapshot()}
+
+
+# Global edge auth instance
+edge_auth = EdgeAuth(ClaimCache(settings.AUTH_CACHE_SIZE))
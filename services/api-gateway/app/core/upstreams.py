@@ -0,0 +1,87 @@
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.circuit_breaker import Bulkhead, CircuitBreaker, UpstreamGuard
+from app.core.config import settings
+
+
+class Upstreams:
+    """
+    One long-lived httpx.AsyncClient per upstream service.
+    
+    Clients are created in the app lifespan and reused by every request, so
+    connections to each service stay open (keep-alive) instead of paying a
+    TCP handshake per proxied call. Each client has its own pool limits and
+    timeouts, and each upstream its own circuit breaker and bulkhead.
+    """
+    
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._guards: Dict[str, UpstreamGuard] = {
+            name: UpstreamGuard(
+                CircuitBreaker(
+                    window=settings.BREAKER_WINDOW,
+                    min_calls=settings.BREAKER_MIN_CALLS,
+                    failure_rate=settings.BREAKER_FAILURE_RATE,
+                    slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+                    slow_call_rate=settings.BREAKER_SLOW_CALL_RATE,
+                    open_seconds=settings.BREAKER_OPEN_SECONDS,
+                    half_open_calls=settings.BREAKER_HALF_OPEN_CALLS
+                ),
+                Bulkhead(settings.UPSTREAM_MAX_CONCURRENCY, settings.UPSTREAM_BULKHEAD_WAIT)
+            )
+            for name in self._config()
+        }
+    
+    def _config(self) -> Dict[str, tuple]:
+        return {
+            "auth": (settings.AUTH_SERVICE_URL, settings.AUTH_SERVICE_TIMEOUT),
+            "driver": (settings.DRIVER_SERVICE_URL, settings.DRIVER_SERVICE_TIMEOUT),
+            "company": (settings.COMPANY_SERVICE_URL, settings.COMPANY_SERVICE_TIMEOUT),
+        }
+    
+    def start(self):
+        """Create the client for every upstream."""
+        limits = httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY
+        )
+        for name, (base_url, timeout) in self._config().items():
+            if name in self._clients:
+                continue
+            self._clients[name] = httpx.AsyncClient(
+                base_url=base_url,
+                limits=limits,
+                timeout=httpx.Timeout(
+                    timeout,
+                    connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+                    pool=settings.UPSTREAM_POOL_TIMEOUT
+                ),
+                http2=settings.UPSTREAM_HTTP2
+            )
+    
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Client for an upstream; the lifespan must have started them."""
+        client: Optional[httpx.AsyncClient] = self._clients.get(name)
+        if client is None:
+            raise RuntimeError(f"Upstream client '{name}' is not started")
+        return client
+    
+    def guard(self, name: str) -> UpstreamGuard:
+        """Circuit breaker and bulkhead for an upstream."""
+        return self._guards[name]
+    
+    def snapshot(self) -> dict:
+        return {name: guard.snapshot() for name, guard in self._guards.items()}
+    
+    async def stop(self):
+        """Close every client and its pooled connections."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+# Global upstream clients instance
+upstreams = Upstreams()
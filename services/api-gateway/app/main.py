@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from .core.responses import ORJSONResponse
 from .api.v1.auth import router as auth_router
 from .api.v1.company import router as company_router
 from .api.v1.driver import router as driver_router
+from .core.response_cache import response_cache
+from .core.security import edge_auth
+from .core.upstreams import upstreams
 from fastapi.middleware.cors import CORSMiddleware
 
 
-app = FastAPI(title="API Gateway", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open pooled upstream clients and the cache listener on startup; close them on shutdown."""
+    edge_auth.check_config()
+    upstreams.start()
+    response_cache.start()
+    
+    yield  # App is running
+    
+    await response_cache.stop()
+    await upstreams.stop()
+
+
+app = FastAPI(title="API Gateway", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +38,21 @@ app.add_middleware(
 def health():
     return {"status": "api-gateway running"}
 
+@app.get("/health/upstreams")
+def upstream_health():
+    """Circuit breaker and bulkhead state per upstream."""
+    return upstreams.snapshot()
+
+@app.get("/health/auth")
+def auth_health():
+    """Edge auth switch, claim cache size and hit/miss counts."""
+    return edge_auth.snapshot()
+
+@app.get("/health/cache")
+def cache_health():
+    """Response cache size, hit/stale/miss counts and invalidations."""
+    return response_cache.snapshot()
+
 @app.get("/info")
 def info():
     return {"service": "api-gateway", "version": "1.0.0"}
@@ -0,0 +1,55 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core import redis_client
+
+# Swapped in before any module binds redis_conn, so scripts register against it too
+redis_client.redis_conn = fakeredis.FakeAsyncRedis()
+
+
+class StubUpstream:
+    """A local HTTP server that answers ok, fails with 500 or never answers."""
+    
+    def __init__(self):
+        self.mode = "ok"
+        self.calls = 0
+        self.connections = 0
+        self._server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                self.calls += 1
+                if self.mode == "hang":
+                    await asyncio.sleep(3600)
+                status = b"200 OK" if self.mode == "ok" else b"500 Internal Server Error"
+                writer.write(b"HTTP/1.1 " + status + b"\r\ncontent-type: application/json\r\n"
+                             b"content-length: 11\r\n\r\n{\"count\":1}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+    
+    async def stop(self):
+        self._server.close()
+
+
+@pytest.fixture
+def stub_upstream():
+    """Factory for local stub upstream servers."""
+    return StubUpstream
+
+
+@pytest.fixture
+def redis():
+    """The shared fake Redis, emptied before each test."""
+    asyncio.run(redis_client.redis_conn.flushall())
+    return redis_client.redis_conn
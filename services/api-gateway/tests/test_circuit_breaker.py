@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, Bulkhead, CircuitBreaker, UpstreamGuard
+from app.core.upstreams import upstreams
+from app.main import app
+
+COUNT_PATH = "/api/v1/drivers/company/6f1c1c52-7a8f-4c53-9a4e-0a4b1f3b2c11/count"
+AUTH = {"authorization": "Bearer token"}
+
+
+@pytest.fixture
+def gateway(stub_upstream):
+    """Run a scenario with the driver upstream pointed at a stub and a small, fast guard."""
+    def run(scenario, bulkhead_size=10, read_timeout=0.2):
+        async def main():
+            stub = stub_upstream()
+            base_url = await stub.start()
+            upstreams._clients["driver"] = httpx.AsyncClient(base_url=base_url, timeout=read_timeout)
+            guard = upstreams._guards["driver"] = UpstreamGuard(
+                CircuitBreaker(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=0.1,
+                               slow_call_rate=0.5, open_seconds=0.3, half_open_calls=2),
+                Bulkhead(bulkhead_size, 0.05)
+            )
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+            try:
+                await scenario(client, stub, guard)
+            finally:
+                await client.aclose()
+                await upstreams._clients.pop("driver").aclose()
+                await stub.stop()
+        
+        original = upstreams._guards["driver"]
+        try:
+            asyncio.run(main())
+        finally:
+            upstreams._guards["driver"] = original
+    return run
+
+
+def test_failing_upstream_opens_the_circuit_then_recovers(gateway):
+    async def scenario(client, stub, guard):
+        stub.mode = "fail"
+        for _ in range(4):
+            assert (await client.get(COUNT_PATH, headers=AUTH)).status_code == 500
+        assert guard.breaker.state == OPEN
+        
+        response = await client.get(COUNT_PATH, headers=AUTH)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert stub.calls == 4  # rejected without touching the upstream
+        
+        stub.mode = "ok"
+        await asyncio.sleep(0.3)
+        for _ in range(2):
+            assert (await client.get(COUNT_PATH, headers=AUTH)).status_code == 200
+        assert guard.breaker.state == CLOSED
+    
+    gateway(scenario)
+
+
+def test_hanging_upstream_fails_fast_once_open(gateway):
+    async def scenario(client, stub, guard):
+        stub.mode = "hang"
+        for _ in range(4):
+            response = await client.get(COUNT_PATH, headers=AUTH)
+            assert response.status_code == 503
+            assert "unavailable" in response.json()["detail"]
+        assert guard.breaker.state == OPEN
+        
+        started = time.monotonic()
+        response = await client.get(COUNT_PATH, headers=AUTH)
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Driver service unavailable: circuit open"
+        assert time.monotonic() - started < 0.1
+    
+    gateway(scenario)
+
+
+def test_bulkhead_rejects_calls_beyond_its_limit(gateway):
+    async def scenario(client, stub, guard):
+        stub.mode = "hang"
+        calls = [asyncio.create_task(client.get(COUNT_PATH, headers=AUTH)) for _ in range(3)]
+        responses = await asyncio.gather(*calls)
+        
+        busy = [r for r in responses if r.json()["detail"].startswith("Driver service busy")]
+        assert len(busy) == 1
+        assert stub.calls == 2
+        assert guard.bulkhead.in_flight == 0
+    
+    gateway(scenario, bulkhead_size=2, read_timeout=0.5)
+
+
+def test_calls_from_before_the_trip_are_not_probes():
+    breaker = CircuitBreaker(window=10, min_calls=2, failure_rate=0.5, slow_call_seconds=1,
+                             slow_call_rate=0.5, open_seconds=0, half_open_calls=1)
+    slow_success = breaker.allow()
+    late_failure = breaker.allow()
+    for _ in range(2):
+        breaker.record(breaker.allow(), False, 0)
+    assert breaker.state == OPEN
+    
+    probe = breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Calls made while closed finish during the half-open period
+    breaker.record(slow_success, True, 0)
+    breaker.record(late_failure, False, 0)
+    assert breaker.state == HALF_OPEN
+    
+    breaker.record(probe, True, 0)
+    assert breaker.state == CLOSED
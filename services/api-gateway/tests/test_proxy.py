@@ -0,0 +1,24 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("body, error", [
+    (b"not json", "json_invalid"),
+    (b"", "missing"),
+])
+def test_invalid_body_is_422(body, error):
+    response = client.post("/api/v1/auth/login", content=body, headers={"content-type": "application/json"})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail[0]["type"] == error
+    assert detail[0]["loc"][0] == "body"
+
+
+def test_schema_errors_are_located_in_body():
+    response = client.post("/api/v1/auth/login", json={"email": 1})
+    assert response.status_code == 422
+    assert {tuple(error["loc"]) for error in response.json()["detail"]} == {("body", "email"), ("body", "password")}
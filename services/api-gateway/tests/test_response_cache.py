@@ -0,0 +1,99 @@
+import asyncio
+
+from app.core.response_cache import CACHE_GENERATION_PREFIX, CachedResponse, ResponseCache
+
+TAGS = ["company:c1"]
+
+
+def make_cache(ttl=10.0, stale=30.0, use_redis=False) -> ResponseCache:
+    return ResponseCache(max_size=100, ttl=ttl, stale=stale, max_body=1 << 20, use_redis=use_redis)
+
+
+class Upstream:
+    """Counts fetches; each returns the next body, optionally after a gate opens."""
+    
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self.gate = None
+    
+    async def fetch(self) -> CachedResponse:
+        self.calls += 1
+        body = f"v{self.calls}".encode()
+        if self.gate is not None:
+            await self.gate.wait()
+        await asyncio.sleep(self.delay)
+        return CachedResponse(200, {"content-type": "text/plain"}, body)
+
+
+def test_concurrent_misses_make_one_upstream_call():
+    async def scenario():
+        cache = make_cache()
+        upstream = Upstream(delay=0.05)
+        results = await asyncio.gather(*(cache.get("k", TAGS, upstream.fetch) for _ in range(50)))
+        
+        assert upstream.calls == 1
+        assert {(entry.body, outcome) for entry, outcome in results} == {(b"v1", "miss")}
+        assert cache.stats["coalesced"] == 49
+    
+    asyncio.run(scenario())
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    async def scenario():
+        cache = make_cache(ttl=0.05)
+        upstream = Upstream()
+        await cache.get("k", TAGS, upstream.fetch)
+        await asyncio.sleep(0.1)
+        
+        upstream.gate = asyncio.Event()
+        for _ in range(5):
+            entry, outcome = await cache.get("k", TAGS, upstream.fetch)
+            assert (entry.body, outcome) == (b"v1", "stale")
+        await asyncio.sleep(0.01)
+        assert upstream.calls == 2  # one background refresh for all five
+        
+        upstream.gate.set()
+        await asyncio.sleep(0.01)
+        entry, outcome = await cache.get("k", TAGS, upstream.fetch)
+        assert (entry.body, outcome) == (b"v2", "hit")
+    
+    asyncio.run(scenario())
+
+
+def test_write_event_bumps_the_generation_so_the_next_read_misses(redis):
+    async def scenario():
+        cache = make_cache(use_redis=True)
+        upstream = Upstream()
+        await cache.get("k", TAGS, upstream.fetch)
+        assert (await cache.get("k", TAGS, upstream.fetch))[1] == "hit"
+        
+        await cache.handle_event('{"company_id": "c1"}')
+        assert await redis.get(CACHE_GENERATION_PREFIX + "company:c1") == b"1"
+        
+        entry, outcome = await cache.get("k", TAGS, upstream.fetch)
+        assert (entry.body, outcome) == (b"v2", "miss")
+        # Another gateway sharing Redis sees the new body, not the invalidated one
+        other = make_cache(use_redis=True)
+        assert (await other.get("k", TAGS, upstream.fetch))[0].body == b"v2"
+    
+    asyncio.run(scenario())
+
+
+def test_refresh_invalidated_on_another_gateway_is_not_shared(redis):
+    async def scenario():
+        cache = make_cache(use_redis=True)
+        other = make_cache(use_redis=True)
+        upstream = Upstream()
+        upstream.gate = asyncio.Event()
+        
+        pending = asyncio.create_task(cache.get("k", TAGS, upstream.fetch))
+        await asyncio.sleep(0.01)
+        await other.invalidate("company:c1")
+        upstream.gate.set()
+        await pending
+        
+        assert cache.stats["stale_writes_rejected"] == 1
+        assert await redis.exists("gw_cache:k") == 0
+    
+    asyncio.run(scenario())
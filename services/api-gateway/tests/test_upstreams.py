@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.core.upstreams import Upstreams
+
+COUNT_PATH = "/api/v1/drivers/company/6f1c1c52-7a8f-4c53-9a4e-0a4b1f3b2c11/count"
+WORKERS, REQUESTS_PER_WORKER = 10, 20
+
+
+async def run_load(call) -> tuple:
+    """(req/s, p99 seconds) for WORKERS concurrent callers."""
+    latencies = []
+    
+    async def worker():
+        for _ in range(REQUESTS_PER_WORKER):
+            started = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(WORKERS)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(len(latencies) * 0.99) - 1]
+
+
+def test_benchmark_pooled_client_against_client_per_request(stub_upstream, monkeypatch):
+    async def scenario():
+        stub = stub_upstream()
+        base_url = await stub.start()
+        monkeypatch.setattr(settings, "DRIVER_SERVICE_URL", base_url)
+        
+        # Before: a fresh client, and so a fresh connection, for every call
+        async def per_request():
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                return await client.get(COUNT_PATH)
+        
+        per_request_rate, per_request_p99 = await run_load(per_request)
+        per_request_connections, stub.connections = stub.connections, 0
+        
+        upstreams = Upstreams()
+        upstreams.start()
+        try:
+            pooled_rate, pooled_p99 = await run_load(lambda: upstreams.get("driver").get(COUNT_PATH))
+        finally:
+            await upstreams.stop()
+            await stub.stop()
+        
+        requests = WORKERS * REQUESTS_PER_WORKER
+        print(f"\n{requests} requests, {WORKERS} concurrent: "
+              f"client per request {per_request_rate:.0f} req/s, p99 {per_request_p99 * 1000:.1f} ms, "
+              f"{per_request_connections} connections; "
+              f"pooled {pooled_rate:.0f} req/s, p99 {pooled_p99 * 1000:.1f} ms, {stub.connections} connections")
+        assert per_request_connections == requests
+        assert stub.connections <= WORKERS
+        assert pooled_rate > per_request_rate
+        assert pooled_p99 < per_request_p99
+    
+    asyncio.run(scenario())
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
+from .core.responses import ORJSONResponse
 from .api.v1.auth import router as auth_router
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Auth Service", version="1.0.0")
+app = FastAPI(title="Auth Service", version="1.0.0", default_response_class=ORJSONResponse)
 @app.get("/health")
 def health():
     return {"status": "auth-service running"}
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
+from .core.responses import ORJSONResponse
 
-app = FastAPI(title="Chat Service", version="1.0.0")
+app = FastAPI(title="Chat Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # WebSocket-only routes
 from .core.websocket import router as websocket_router
@@ -7,6 +7,8 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_HOURS: int = 5
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     MAX_PASSWORD_LENGTH: int = 128
+    # Key the api-gateway signs verified identities with; empty disables the fast path
+    INTERNAL_AUTH_KEY: str = ""
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
+from .core.responses import ORJSONResponse
 from .api.v1.company import router as companies_router
 from .api.v1.company_user import router as company_users_router
 
-app = FastAPI(title="Company Service", version="1.0.0")
+app = FastAPI(title="Company Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 @app.get("/health")
 def health():
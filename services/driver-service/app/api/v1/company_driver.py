@@ -8,6 +8,7 @@ from app.db.session import get_db
 from app.db.models import Driver, DriverStatus
 from app.schemas.driver import DriverCountResponse, DriverCreate, DriverResponse
 from app.core.security import get_current_user_id, security
+from app.core.events import DRIVER_REGISTERED, publish_driver_event
 
 router = APIRouter(
     prefix="/drivers/company",
@@ -239,4 +240,6 @@ async def register_driver_for_company(
     db.commit()
     db.refresh(driver)
     
+    await publish_driver_event(DRIVER_REGISTERED, driver.id, driver.company_id)
+    
     return driver
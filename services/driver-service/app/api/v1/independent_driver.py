@@ -5,6 +5,7 @@ import httpx
 
 from app.db.session import get_db
 from app.db.models import Driver, DriverStatus
+from app.core.events import DRIVER_REGISTERED, publish_driver_event
 from app.schemas.driver import DriverCreate, DriverResponse
 
 router = APIRouter(
@@ -136,4 +137,6 @@ async def register_independent_driver(
     db.commit()
     db.refresh(driver)
     
+    await publish_driver_event(DRIVER_REGISTERED, driver.id, driver.company_id)
+    
     return driver
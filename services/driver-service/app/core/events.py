@@ -0,0 +1,28 @@
+import json
+from typing import Optional
+from uuid import UUID
+
+from app.core.redis_client import redis_conn
+from app.core.settings import settings
+
+# Event types published on the driver events channel
+DRIVER_REGISTERED = "driver_registered"
+
+
+async def publish_driver_event(event_type: str, driver_id: UUID, company_id: Optional[UUID]):
+    """
+    Publish a driver write event after it has been committed.
+    
+    Subscribers such as the api-gateway response cache use these to drop
+    data they cached about the company. Publishing is best effort: a Redis
+    outage must not fail the write, and caches expire on their own anyway.
+    """
+    event = {
+        "type": event_type,
+        "driver_id": str(driver_id),
+        "company_id": str(company_id) if company_id else None,
+    }
+    try:
+        await redis_conn.publish(settings.DRIVER_EVENTS_CHANNEL, json.dumps(event))
+    except Exception as e:
+        print(f"❌ Failed to publish {event_type} for driver {driver_id}: {e}")
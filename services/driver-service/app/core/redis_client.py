@@ -0,0 +1,11 @@
+import redis.asyncio as redis
+from app.core.settings import settings
+
+# Redis connection (async, bounded pool)
+redis_pool = redis.BlockingConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+    max_connections=settings.REDIS_MAX_CONNECTIONS
+)
+redis_conn = redis.Redis(connection_pool=redis_pool)
@@ -1,6 +1,10 @@
+import hashlib
+import hmac
+import time
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
 from uuid import UUID
 
 from app.core.settings import settings
@@ -8,7 +12,38 @@ from app.core.settings import settings
 
 security = HTTPBearer()
 
-def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UUID:
+# Set by the api-gateway after it has verified the bearer token
+INTERNAL_IDENTITY_HEADER = "x-gateway-identity"
+
+
+def gateway_user_id(request: Request) -> Optional[UUID]:
+    """User id from a valid, unexpired gateway identity header, else None."""
+    value = request.headers.get(INTERNAL_IDENTITY_HEADER)
+    if not value or not settings.INTERNAL_AUTH_KEY:
+        return None
+    try:
+        user_id, expires, signature = value.split(".")
+        expected = hmac.new(
+            settings.INTERNAL_AUTH_KEY.encode(),
+            f"{user_id}.{expires}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        if not hmac.compare_digest(signature, expected) or int(expires) <= time.time():
+            return None
+        return UUID(user_id)
+    except ValueError:
+        return None
+
+
+def get_current_user_id(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> UUID:
+    # Fast path: the gateway already verified this token
+    user_id = gateway_user_id(request)
+    if user_id is not None:
+        return user_id
+
     try:
         token = credentials.credentials
         payload = jwt.decode(
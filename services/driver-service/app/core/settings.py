@@ -7,6 +7,15 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_HOURS: int = 5
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     MAX_PASSWORD_LENGTH: int = 128
+    # Key the api-gateway signs verified identities with; empty disables the fast path
+    INTERNAL_AUTH_KEY: str = ""
+
+    # Redis, for publishing driver events (e.g. gateway cache invalidation)
+    REDIS_HOST: str = "redis"
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 10
+    DRIVER_EVENTS_CHANNEL: str = "driver_events"
 
     class Config:
         env_file = ".env"
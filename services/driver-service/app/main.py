@@ -1,8 +1,9 @@
 from fastapi import FastAPI
+from .core.responses import ORJSONResponse
 from .api.v1.company_driver import router as company_driver_router
 from .api.v1.independent_driver import router as independent_driver_router
 
-app = FastAPI(title="Driver Service", version="1.0.0")
+app = FastAPI(title="Driver Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 @app.get("/health")
 def health():
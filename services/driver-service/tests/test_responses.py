@@ -0,0 +1,75 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.core.responses import ORJSONResponse
+
+
+def driver_rows(count: int) -> dict:
+    """A get_drivers_for_company-shaped payload with count drivers."""
+    company_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    return {
+        "company_id": company_id,
+        "count": count,
+        "drivers": [
+            {
+                "id": uuid.uuid4(),
+                "user_id": uuid.uuid4(),
+                "status": "available",
+                "is_verified": True,
+                "is_active": True,
+                "license_number": f"BT-{i:06d}",
+                "vehicle_make": "Toyota",
+                "vehicle_model": "Corolla",
+                "vehicle_plate": f"BP-1-{i:04d}",
+                "created_at": now,
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def test_renders_uuid_and_datetime():
+    payload = {"id": uuid.UUID(int=1), "at": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}
+    assert orjson.loads(ORJSONResponse(payload).body) == {
+        "id": "00000000-0000-0000-0000-000000000001",
+        "at": "2026-01-02T03:04:05+00:00",
+    }
+
+
+def timed(call, repeat: int = 5) -> float:
+    call()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - started) / repeat
+
+
+@pytest.mark.parametrize("rows", [1000, 10000])
+def test_benchmark_list_endpoint(rows):
+    payload = driver_rows(rows)
+    app = FastAPI()
+    app.get("/stdlib", response_class=JSONResponse)(lambda: payload)
+    app.get("/orjson", response_class=ORJSONResponse)(lambda: payload)
+    client = TestClient(app)
+    assert client.get("/orjson").json() == client.get("/stdlib").json()
+    
+    # Rendering alone, on content already made JSON-compatible by FastAPI
+    encoded = jsonable_encoder(payload)
+    render_stdlib = timed(lambda: JSONResponse(encoded))
+    render_orjson = timed(lambda: ORJSONResponse(encoded))
+    # The whole request, including FastAPI's jsonable_encoder pass
+    request_stdlib = timed(lambda: client.get("/stdlib"))
+    request_orjson = timed(lambda: client.get("/orjson"))
+    
+    print(f"\n{rows} rows: render stdlib {render_stdlib * 1000:.1f} ms, orjson {render_orjson * 1000:.1f} ms; "
+          f"request stdlib {request_stdlib * 1000:.1f} ms, orjson {request_orjson * 1000:.1f} ms")
+    assert render_orjson < render_stdlib
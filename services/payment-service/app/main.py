@@ -1,6 +1,7 @@
 from fastapi import FastAPI
+from app.core.responses import ORJSONResponse
 
-app = FastAPI(title="Payment Service", version="1.0.0")
+app = FastAPI(title="Payment Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 @app.get("/health")
 def health():
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, status
 import uuid
 import time
-from typing import List, Tuple
 
+from app.core.batch_matching import batch_matcher
+from app.core.config import settings
+from app.core.dispatch import dispatcher, find_available_drivers
 from app.core.redis_client import redis_conn, decode_val
-from app.core.websocket_manager import ws_manager
+from app.core.ride_events import REQUESTED, add_event
 from app.schemas.ride import RideRequest
 
 router = APIRouter(prefix="/rides", tags=["Ride Requests"])
@@ -13,92 +15,86 @@ router = APIRouter(prefix="/rides", tags=["Ride Requests"])
 @router.post("/request", status_code=status.HTTP_201_CREATED)
 async def request_ride(data: RideRequest):
     """
-    Request a ride. Finds nearby drivers and sends ride request via WebSocket.
+    Request a ride. Offers it to the nearest drivers via WebSocket, widening
+    the search in stages until a driver accepts or the request expires.
     """
     passenger_id = data.passenger_id
     lat, lon = data.lat, data.lon
     
     # Check if passenger already has an active ride
-    existing_ride = redis_conn.get(f"ride:passenger:{passenger_id}")
+    existing_ride = await redis_conn.get(f"ride:passenger:{passenger_id}")
     if existing_ride:
         return {
             "status": "already_in_ride",
             "ride_id": decode_val(existing_ride)
         }
     
-    # Check if passenger already has a pending request
-    for key in redis_conn.scan_iter("ride_request:*"):
-        ride_info = redis_conn.hgetall(key)
-        if ride_info:
-            pid = decode_val(ride_info.get("passenger_id", b""))
-            ride_status = decode_val(ride_info.get("status", b""))
-            
-            if pid == passenger_id and ride_status == "pending":
-                request_id = decode_val(key).split(":", 1)[1] if isinstance(key, bytes) else key.split(":", 1)[1]
-                return {
-                    "status": "already_requested",
-                    "request_id": request_id
-                }
-    
-    # Generate request ID
+    # Generate request ID and claim the passenger's pending-request slot;
+    # SET NX makes concurrent requests from one passenger start one dispatch
     request_id = str(uuid.uuid4())
+    index_key = f"ride_request:passenger:{passenger_id}"
+    while not await redis_conn.set(index_key, request_id, nx=True, ex=settings.RIDE_REQUEST_TTL):
+        pending_request_id = await redis_conn.get(index_key)
+        if pending_request_id is not None:
+            return {
+                "status": "already_requested",
+                "request_id": decode_val(pending_request_id)
+            }
+        # The pending request expired between SET NX and GET; claim again
     
-    # Save passenger location
-    redis_conn.hset(
-        f"passenger:{passenger_id}",
-        mapping={
-            "lat": lat,
-            "lon": lon,
-            "timestamp": time.time()
-        }
-    )
-    
-    # Find nearby drivers (within 10km)
-    nearby = redis_conn.georadius(
-        "drivers_geo",
-        lon,
-        lat,
-        10,
-        unit="km",
-        withdist=True
-    )
-    
-    # Decode driver IDs
-    available_drivers: List[Tuple[str, float]] = []
-    for raw_id, dist in nearby:
-        d_id = decode_val(raw_id)
-        # Check if driver is available
-        if redis_conn.sismember("available_drivers", d_id):
-            available_drivers.append((d_id, dist))
-    
-    if not available_drivers:
-        return {"status": "no_drivers_available"}
-    
-    # Create ride request in Redis
-    redis_conn.hset(
-        f"ride_request:{request_id}",
-        mapping={
-            "passenger_id": passenger_id,
-            "pickup_lat": lat,
-            "pickup_lon": lon,
-            "status": "pending"
-        }
-    )
-    redis_conn.expire(f"ride_request:{request_id}", 300)  # Expire after 5 minutes
-    
-    # Send ride request to nearby available drivers
-    notified_count = 0
-    for driver_id, distance in available_drivers:
-        if driver_id in ws_manager.driver_connections:
-            await ws_manager.send_to_driver(driver_id, {
-                "type": "ride_request",
-                "request_id": request_id,
+    try:
+        # Save passenger location
+        await redis_conn.hset(
+            f"passenger:{passenger_id}",
+            mapping={
+                "lat": lat,
+                "lon": lon,
+                "timestamp": time.time()
+            }
+        )
+        
+        # Find available drivers within the widest dispatch ring, nearest first
+        available_drivers = await find_available_drivers(
+            lat, lon, dispatcher.max_radius_km, dispatcher.max_drivers
+        )
+        
+        if not available_drivers:
+            await redis_conn.delete(index_key)
+            return {"status": "no_drivers_available"}
+        
+        # Create the ride request; the passenger index was claimed up front
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.hset(
+            f"ride_request:{request_id}",
+            mapping={
                 "passenger_id": passenger_id,
                 "pickup_lat": lat,
                 "pickup_lon": lon,
-                "distance_km": round(distance, 2)
-            })
-            notified_count += 1
+                "status": "pending",
+                "created_at": time.time()
+            }
+        )
+        pipe.expire(f"ride_request:{request_id}", settings.RIDE_REQUEST_TTL)
+        add_event(pipe, REQUESTED, request_id=request_id, passenger_id=passenger_id, pickup_lat=lat, pickup_lon=lon)
+        await pipe.execute()
+    except Exception:
+        # Free the claim so the passenger can retry
+        await redis_conn.delete(index_key)
+        raise
+    
+    request = {
+        "request_id": request_id,
+        "passenger_id": passenger_id,
+        "pickup_lat": lat,
+        "pickup_lon": lon
+    }
+    
+    # Offer to the nearest drivers first; the dispatcher widens the ring over time.
+    # In batch mode the first offer goes to the driver assigned by the batch solver.
+    if settings.RIDE_BATCH_MATCHING:
+        notified_count = await batch_matcher.submit(request, available_drivers)
+    else:
+        notified_count = await dispatcher.start(request, available_drivers)
     
     return {
         "status": "request_sent",
@@ -1,9 +1,21 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+import orjson
+import struct
 import time
 from uuid import UUID
 
+from app.core import wire
+from app.core.config import settings
+from app.core.dispatch import dispatcher
+from app.core.driver_index import driver_index
+from app.core.driver_shards import driver_shards
+from app.core.location_ingest import location_ingest
+from app.core.metrics import metrics
 from app.core.redis_client import redis_conn, decode_dict, decode_val
-from app.core.websocket_manager import ws_manager
+from app.core.redis_scripts import assign_ride_script, complete_ride_script, delete_if_equals_script
+from app.core.ride_cache import ride_cache
+from app.core.ride_events import ASSIGNED, COMPLETED, add_event
+from app.core.websocket_manager import ClientConnection, ws_manager
 
 router = APIRouter(tags=["WebSocket"])
 
@@ -11,15 +23,16 @@ router = APIRouter(tags=["WebSocket"])
 @router.websocket("/ws/driver/{driver_id}")
 async def driver_websocket(websocket: WebSocket, driver_id: str):
     """WebSocket endpoint for drivers to receive ride requests and send location updates."""
-    await ws_manager.connect_driver(driver_id, websocket)
+    conn = await ws_manager.connect_driver(driver_id, websocket)
     
     # Add driver to available drivers set
-    redis_conn.sadd("available_drivers", driver_id)
+    await driver_shards.connect(driver_id)
+    driver_index.set_available(driver_id, True)
     print(f"🚗 Driver {driver_id} connected")
     
     # Check for ongoing ride (restore state on reconnect)
     ride_key = f"ride:driver:{driver_id}"
-    ride_data = redis_conn.hgetall(ride_key)
+    ride_data = await redis_conn.hgetall(ride_key)
     
     if ride_data:
         ride = decode_dict(ride_data)
@@ -29,6 +42,9 @@ async def driver_websocket(websocket: WebSocket, driver_id: str):
         request_id = ride.get("request_id")
         status = ride.get("status", "assigned")
         
+        if passenger_id:
+            ride_cache.set(driver_id, passenger_id, request_id)
+        
         if passenger_id and pickup_lat is not None and pickup_lon is not None:
             try:
                 await ws_manager.send_to_driver(driver_id, {
@@ -45,7 +61,21 @@ async def driver_websocket(websocket: WebSocket, driver_id: str):
     
     try:
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            # Compact binary location frame (cab.location.v1 subprotocol)
+            if message.get("bytes") is not None:
+                try:
+                    lat, lon, driver_status = wire.decode_location(message["bytes"])
+                except struct.error:
+                    print(f"❌ Invalid location frame from driver {driver_id}")
+                    continue
+                await handle_location_update(driver_id, lat, lon, driver_status)
+                continue
+            
+            data = orjson.loads(message["text"])
             
             # Handle ride acceptance
             if data.get("type") == "accept_ride":
@@ -75,50 +105,41 @@ async def driver_websocket(websocket: WebSocket, driver_id: str):
                 print("❌ Invalid float:", data)
                 continue
             
-            # Update driver location in Redis GEO
-            redis_conn.geoadd("drivers_geo", [lon, lat, driver_id])
-            
-            # Update driver info
-            redis_conn.hset(
-                f"driver:{driver_id}",
-                mapping={
-                    "lat": lat,
-                    "lon": lon,
-                    "status": data.get("status", "available")
-                }
-            )
-            
-            # If driver is in a ride, send location to passenger
-            passenger_id = redis_conn.hget(f"ride:driver:{driver_id}", "passenger_id")
-            if passenger_id:
-                passenger_id = decode_val(passenger_id)
-                await ws_manager.send_to_passenger(passenger_id, {
-                    "type": "driver_location_update",
-                    "driver_id": driver_id,
-                    "lat": lat,
-                    "lon": lon
-                })
-                print(f"📡 Sent driver location to passenger {passenger_id}")
+            await handle_location_update(driver_id, lat, lon, data.get("status", "available"))
     
     except WebSocketDisconnect:
         print(f"🚗 Driver {driver_id} disconnected")
-        redis_conn.srem("available_drivers", driver_id)
-        ws_manager.disconnect_driver(driver_id)
+        await _driver_gone(driver_id, conn)
     except Exception as e:
         print(f"❌ Error in driver WebSocket {driver_id}: {e}")
-        redis_conn.srem("available_drivers", driver_id)
-        ws_manager.disconnect_driver(driver_id)
+        await _driver_gone(driver_id, conn)
+
+
+async def _driver_gone(driver_id: str, conn: ClientConnection):
+    """Drop a disconnected driver from every local structure and their shard."""
+    # After a reconnect to this node the driver's state belongs to the new socket
+    if ws_manager.replaced("driver", driver_id, conn):
+        return
+    # Buffered positions go first, so no later flush puts the driver back
+    location_ingest.discard(driver_id)
+    await ws_manager.disconnect_driver(driver_id, conn)
+    if ws_manager.replaced("driver", driver_id, conn):
+        return  # reconnected while presence was being released
+    await driver_shards.set_available(driver_id, False)
+    driver_shards.forget(driver_id)
+    driver_index.set_available(driver_id, False)
+    ride_cache.clear(driver_id)
 
 
 @router.websocket("/ws/passenger/{passenger_id}")
 async def passenger_websocket(websocket: WebSocket, passenger_id: str):
     """WebSocket endpoint for passengers to receive ride updates."""
-    await ws_manager.connect_passenger(passenger_id, websocket)
+    conn = await ws_manager.connect_passenger(passenger_id, websocket)
     print(f"👤 Passenger {passenger_id} connected")
     
     # Check for ongoing ride (restore state on reconnect)
     ride_key = f"ride:passenger:{passenger_id}"
-    ride_data = redis_conn.hgetall(ride_key)
+    ride_data = await redis_conn.hgetall(ride_key)
     
     if ride_data:
         ride = decode_dict(ride_data)
@@ -147,44 +168,72 @@ async def passenger_websocket(websocket: WebSocket, passenger_id: str):
     
     except WebSocketDisconnect:
         print(f"👤 Passenger {passenger_id} disconnected")
-        ws_manager.disconnect_passenger(passenger_id)
+        await ws_manager.disconnect_passenger(passenger_id, conn)
     except Exception as e:
         print(f"❌ Error in passenger WebSocket {passenger_id}: {e}")
-        ws_manager.disconnect_passenger(passenger_id)
+        await ws_manager.disconnect_passenger(passenger_id, conn)
 
 
-async def handle_driver_accept(driver_id: str, request_id: str):
-    """Handle driver accepting a ride request."""
-    ride_key = f"ride_request:{request_id}"
-    ride_data = redis_conn.hgetall(ride_key)
-    
-    if not ride_data:
-        await ws_manager.send_to_driver(driver_id, {"type": "ride_taken"})
-        return
-    
-    ride = decode_dict(ride_data)
+async def handle_location_update(driver_id: str, lat: float, lon: float, driver_status: str):
+    """Record a driver position and forward it to the passenger if on a ride."""
+    # Queue location for the next batched GEO/hash write
+    location_ingest.submit(driver_id, lon, lat, driver_status)
     
-    # Atomic assignment using Lua script
-    lua_script = """
-    local k = KEYS[1]
-    local expected = ARGV[1]
-    local driver = ARGV[2]
-    local cur = redis.call('HGET', k, 'status')
-    if not cur then return -1 end
-    if cur ~= expected then return 0 end
-    redis.call('HSET', k, 'status', 'assigned')
-    redis.call('HSET', k, 'driver_id', driver)
-    return 1
+    # If driver is in a ride, send location to passenger
+    passenger_id = ride_cache.get(driver_id)
+    if passenger_id:
+        await ws_manager.send_to_passenger(passenger_id, {
+            "type": "driver_location_update",
+            "driver_id": driver_id,
+            "lat": lat,
+            "lon": lon
+        })
+        print(f"📡 Sent driver location to passenger {passenger_id}")
+
+
+async def _write_assignment(driver_id: str, request_id: str, passenger_id: str, ride: dict):
     """
+    Write both sides' ride state for a claimed request.
     
-    res = redis_conn.eval(lua_script, 1, ride_key, "pending", driver_id)
+    These keys sit in different Redis Cluster slots, so they are pipelined
+    rather than scripted; the claim on the request hash already decided the
+    winner, so nothing else writes them concurrently.
+    """
+    ttl = settings.RIDE_STATE_TTL
+    pickup = {"pickup_lat": ride.get("pickup_lat"), "pickup_lon": ride.get("pickup_lon"), "status": "assigned"}
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.hset(f"ride:driver:{driver_id}", mapping={"request_id": request_id, "passenger_id": passenger_id, **pickup})
+    pipe.expire(f"ride:driver:{driver_id}", ttl)
+    pipe.hset(f"ride:passenger:{passenger_id}", mapping={"request_id": request_id, "driver_id": driver_id, **pickup})
+    pipe.expire(f"ride:passenger:{passenger_id}", ttl)
+    # Before the driver's first location there is no available set to leave
+    available = driver_shards.available_key_for(driver_id)
+    if available is not None:
+        pipe.srem(available, driver_id)
+    add_event(pipe, ASSIGNED, request_id=request_id, driver_id=driver_id, passenger_id=passenger_id)
+    await pipe.execute()
+    await delete_if_equals_script(keys=[f"ride_request:passenger:{passenger_id}"], args=[request_id])
+
+
+async def handle_driver_accept(driver_id: str, request_id: str):
+    """Handle driver accepting a ride request."""
+    # Atomically claim the request; only one driver can win it
+    res = await assign_ride_script(
+        keys=[f"ride_request:{request_id}"],
+        args=[driver_id, settings.RIDE_STATE_TTL]
+    )
     
-    if res != 1:
+    if not isinstance(res, list):
         await ws_manager.send_to_driver(driver_id, {"type": "ride_taken"})
         return
     
-    # Success - assign ride
+    ride = decode_dict(dict(zip(res[::2], res[1::2])))
     passenger_id = ride.get("passenger_id")
+    await _write_assignment(driver_id, request_id, passenger_id, ride)
+    driver_shards.mark(driver_id, False)
+    driver_index.set_available(driver_id, False)
+    
+    # Success - assign ride
     try:
         pickup_lat = float(ride.get("pickup_lat"))
         pickup_lon = float(ride.get("pickup_lon"))
@@ -195,25 +244,14 @@ async def handle_driver_accept(driver_id: str, request_id: str):
         })
         return
     
-    # Save driver's ongoing ride
-    redis_conn.hset(f"ride:driver:{driver_id}", mapping={
-        "request_id": request_id,
-        "passenger_id": passenger_id,
-        "pickup_lat": pickup_lat,
-        "pickup_lon": pickup_lon,
-        "status": "assigned"
-    })
-    redis_conn.expire(f"ride:driver:{driver_id}", 3600)
+    # Stop widening the offer and record how long matching took
+    dispatcher.notify_accepted(request_id)
+    try:
+        metrics.observe("ride_time_to_accept_seconds", time.time() - float(ride["created_at"]))
+    except (KeyError, ValueError):
+        pass
     
-    # Save passenger's ride
-    redis_conn.hset(f"ride:passenger:{passenger_id}", mapping={
-        "request_id": request_id,
-        "driver_id": driver_id,
-        "pickup_lat": pickup_lat,
-        "pickup_lon": pickup_lon,
-        "status": "assigned"
-    })
-    redis_conn.expire(f"ride:passenger:{passenger_id}", 3600)
+    await ride_cache.assign(driver_id, passenger_id, request_id)
     
     # Notify passenger
     await ws_manager.send_to_passenger(passenger_id, {
@@ -232,35 +270,55 @@ async def handle_driver_accept(driver_id: str, request_id: str):
         "request_id": request_id
     })
     
-    # Remove driver from available set
-    redis_conn.srem("available_drivers", driver_id)
-    
-    # Notify other drivers that ride is taken
-    await ws_manager.broadcast_to_drivers(
-        {"type": "ride_taken", "request_id": request_id},
-        exclude_driver_id=driver_id
+    # Notify the other drivers who were offered this ride that it is taken
+    offered = await redis_conn.smembers(f"ride_request:{request_id}:drivers")
+    await ws_manager.send_to_drivers(
+        [d_id for d_id in map(decode_val, offered) if d_id != driver_id],
+        {"type": "ride_taken", "request_id": request_id}
     )
 
 
 async def handle_ride_completion(driver_id: str, request_id: str):
     """Handle ride completion."""
-    ride_key = f"ride_request:{request_id}"
-    ride_data = redis_conn.hgetall(ride_key)
+    # Atomically mark the request completed, if this driver holds it
+    res = await complete_ride_script(keys=[f"ride_request:{request_id}"], args=[driver_id, time.time()])
     
-    if not ride_data:
+    if not isinstance(res, list):
         await ws_manager.send_to_driver(driver_id, {
             "type": "error",
             "message": "Ride not found"
         })
         return
     
-    ride = decode_dict(ride_data)
+    # Clear the ride state, free the driver and record the completion together
+    ride = decode_dict(dict(zip(res[::2], res[1::2])))
+    passenger_id = ride.get("passenger_id")
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.delete(f"ride_request:{request_id}")
+    pipe.delete(f"ride_request:{request_id}:drivers")
+    pipe.delete(f"ride:driver:{driver_id}")
+    if passenger_id:
+        pipe.delete(f"ride:passenger:{passenger_id}")
+    # With the shard unknown there is no set to join; the next location flush adds the driver
+    available = driver_shards.available_key_for(driver_id)
+    if available is not None:
+        pipe.sadd(available, driver_id)
+    add_event(
+        pipe, COMPLETED,
+        request_id=request_id,
+        driver_id=driver_id,
+        passenger_id=passenger_id,
+        pickup_lat=ride.get("pickup_lat"),
+        pickup_lon=ride.get("pickup_lon"),
+        created_at=ride.get("created_at"),
+        completed_at=ride.get("completed_at")
+    )
+    await pipe.execute()
     
-    # Mark ride as completed
-    redis_conn.hset(ride_key, "status", "completed")
     print(f"✅ Ride {request_id} completed by driver {driver_id}")
-    
-    passenger_id = ride.get("passenger_id")
+    driver_shards.mark(driver_id, True)
+    driver_index.set_available(driver_id, True)
+    await ride_cache.release(driver_id)
     
     # Notify passenger
     if passenger_id:
@@ -269,15 +327,6 @@ async def handle_ride_completion(driver_id: str, request_id: str):
             "request_id": request_id
         })
     
-    # Add driver back to available list
-    redis_conn.sadd("available_drivers", driver_id)
-    
-    # Cleanup
-    redis_conn.delete(ride_key)
-    redis_conn.delete(f"ride:driver:{driver_id}")
-    if passenger_id:
-        redis_conn.delete(f"ride:passenger:{passenger_id}")
-    
     # Confirm to driver
     await ws_manager.send_to_driver(driver_id, {
         "type": "ride_completed_ack",
@@ -0,0 +1,34 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_matrix(req_lat: np.ndarray, req_lon: np.ndarray,
+                     drv_lat: np.ndarray, drv_lon: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km between every request and every driver."""
+    lat1 = np.radians(req_lat)[:, None]
+    lon1 = np.radians(req_lon)[:, None]
+    lat2 = np.radians(drv_lat)[None, :]
+    lon2 = np.radians(drv_lon)[None, :]
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def solve_assignment(cost: np.ndarray) -> np.ndarray:
+    """
+    Minimum-cost assignment of rows to columns.
+    
+    Returns, for each row, the assigned column or -1. Rectangular matrices
+    are solved as they are (every row or every column gets matched, whichever
+    side is shorter) by SciPy's shortest augmenting path solver, so uneven
+    surge batches cost no more than the square case of the shorter side.
+    """
+    n, m = cost.shape
+    assignment = np.full(n, -1)
+    if n == 0 or m == 0:
+        return assignment
+    rows, cols = linear_sum_assignment(cost)
+    assignment[rows] = cols
+    return assignment
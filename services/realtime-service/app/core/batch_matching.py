@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.core.assignment import haversine_matrix, solve_assignment
+from app.core.config import settings
+from app.core.dispatch import dispatcher
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn
+
+PICKUP_DISTANCE_BUCKETS = (0.5, 1, 2, 3, 5, 7.5, 10, 15, 20)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000)
+
+
+class BatchMatcher:
+    """
+    Collect ride requests for a short window and match them as a batch.
+    
+    Each window builds a request x driver pickup-distance matrix from the
+    drivers' last positions and solves it as an assignment problem, so
+    total pickup distance across the batch is minimized instead of first
+    come, first served. Every matched request is handed to the dispatcher with its
+    assigned driver as the first offer; unmatched requests dispatch normally.
+    """
+    
+    def __init__(self, window: float, radius_km: float):
+        self.window = window
+        self.radius_km = radius_km
+        self._pending: List[Tuple[dict, List[Tuple[str, float]], asyncio.Future]] = []
+        self._task = None
+    
+    async def submit(self, request: dict, candidates: List[Tuple[str, float]]) -> int:
+        """Queue a request for the next batch; returns how many drivers it was offered to."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((request, candidates, future))
+        return await future
+    
+    async def _match(self, batch) -> Dict[int, Tuple[str, float]]:
+        driver_ids = sorted({d_id for _, candidates, _ in batch for d_id, _ in candidates})
+        if not driver_ids:
+            return {}
+        
+        # Drivers can sit in different GEO shards; their hash has the position too
+        pipe = redis_conn.pipeline(transaction=False)
+        for d_id in driver_ids:
+            pipe.hmget(f"driver:{d_id}", "lon", "lat")
+        positions = await pipe.execute()
+        known = [(d_id, pos) for d_id, pos in zip(driver_ids, positions) if None not in pos]
+        if not known:
+            return {}
+        
+        drv_lon = np.array([float(pos[0]) for _, pos in known], dtype=float)
+        drv_lat = np.array([float(pos[1]) for _, pos in known], dtype=float)
+        req_lat = np.array([request["pickup_lat"] for request, _, _ in batch], dtype=float)
+        req_lon = np.array([request["pickup_lon"] for request, _, _ in batch], dtype=float)
+        
+        started = time.perf_counter()
+        # Off the event loop: a large batch must not stall every socket on the node
+        distance, infeasible, assignment = await asyncio.to_thread(
+            self._solve, req_lat, req_lon, drv_lat, drv_lon, len(batch)
+        )
+        metrics.observe("batch_solve_seconds", time.perf_counter() - started)
+        
+        matches = {}
+        for i, j in enumerate(assignment):
+            if j >= 0 and not infeasible[i, j]:
+                matches[i] = (known[j][0], float(distance[i, j]))
+                metrics.observe("batch_pickup_distance_km", matches[i][1], buckets=PICKUP_DISTANCE_BUCKETS)
+        return matches
+    
+    def _solve(self, req_lat, req_lon, drv_lat, drv_lon, batch_size: int):
+        distance = haversine_matrix(req_lat, req_lon, drv_lat, drv_lon)
+        # Out-of-range pairs cost more than any in-range assignment could save
+        infeasible = distance > self.radius_km
+        cost = np.where(infeasible, self.radius_km * (batch_size + 1), distance)
+        return distance, infeasible, solve_assignment(cost)
+    
+    async def flush(self):
+        """Match everything collected so far and start dispatching it."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        metrics.observe("batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        
+        try:
+            matches = await self._match(batch)
+        except Exception as e:
+            print(f"❌ Batch matching failed, dispatching individually: {e}")
+            matches = {}
+        metrics.inc("batch_matched", len(matches))
+        
+        for i, (request, candidates, future) in enumerate(batch):
+            offer = [matches[i]] if i in matches else candidates
+            try:
+                notified = await dispatcher.start(request, offer)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(notified)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            await self.flush()
+    
+    def start(self):
+        """Start the periodic batching task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop batching and dispatch anything still collected."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Global batch matcher instance (used when RIDE_BATCH_MATCHING is on)
+batch_matcher = BatchMatcher(settings.RIDE_BATCH_WINDOW, dispatcher.max_radius_km)
@@ -1,3 +1,4 @@
+from typing import List, Tuple
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +6,51 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0  # seconds to wait for a free connection
+    
+    # Cluster / WebSocket presence
+    NODE_ID: str = ""  # defaults to hostname:pid
+    WS_PRESENCE_TTL: int = 60  # seconds, refreshed every TTL/3
+    WS_SEND_TIMEOUT: float = 2.0  # seconds per WebSocket send
+    WS_SEND_MAX_TIMEOUTS: int = 3  # consecutive timeouts before a socket is evicted
+    WS_OUTBOUND_QUEUE_SIZE: int = 100  # queued messages per connection
+    WS_FANOUT_CONCURRENCY: int = 256  # sends in flight per fanout
+    PUBSUB_QUEUE_SIZE: int = 1000  # pending pub/sub messages before the reader waits
+    
+    # Driver location ingest
+    LOCATION_FLUSH_INTERVAL_MS: int = 100
+    
+    # Driver GEO/availability sharding by geohash prefix (0 = one global set)
+    DRIVER_SHARD_PRECISION: int = 0  # 3 ~ 156 km cells, 4 ~ 39 x 20 km cells
+    
+    # In-memory driver index for nearest-driver queries
+    DRIVER_INDEX_ENABLED: bool = False
+    DRIVER_INDEX_CELL_KM: float = 0.5  # grid cell size
+    DRIVER_INDEX_SYNC_INTERVAL: float = 5.0  # seconds between full syncs from Redis
+    
+    # Stale driver eviction
+    DRIVER_STALE_AFTER: int = 90  # seconds without a heartbeat before eviction
+    DRIVER_SWEEP_INTERVAL: int = 15  # seconds between sweeps
+    DRIVER_SWEEP_BATCH: int = 500  # drivers evicted per script call
+    
+    # Ride matching
+    RIDE_REQUEST_TTL: int = 300  # seconds a request stays pending
+    RIDE_STATE_TTL: int = 3600  # seconds assigned ride state is kept
+    RIDE_EVENTS_STREAM: str = "ride_events"  # lifecycle events consumed by ride-service
+    RIDE_STREAM_MAXLEN: int = 5000000  # approximate lifecycle entries kept (a few per ride)
+    # On-ride driver positions, kept apart so their volume can't trim lifecycle events
+    RIDE_LOCATIONS_STREAM: str = "ride_locations"
+    RIDE_LOCATIONS_MAXLEN: int = 1000000
+    # Dispatch stages: (radius_km, max_drivers, wait_seconds), tried in order
+    RIDE_DISPATCH_STAGES: List[Tuple[float, int, float]] = [
+        (2, 3, 10),
+        (5, 8, 15),
+        (10, 20, 20),
+    ]
+    # Batch matching: collect requests for a window and assign them together
+    RIDE_BATCH_MATCHING: bool = False
+    RIDE_BATCH_WINDOW: float = 2.0  # seconds
     
     class Config:
         env_file = ".env"
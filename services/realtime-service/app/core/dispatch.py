@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.driver_index import driver_index
+from app.core.driver_shards import available_key, geo_key, shards_for
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn, decode_val
+from app.core.redis_scripts import (
+    delete_if_equals_script,
+    expire_ride_request_script,
+    find_available_drivers_script,
+)
+from app.core.ride_events import EXPIRED, OFFERED, add_event, emit_event
+from app.core.websocket_manager import ws_manager
+
+STAGE_BUCKETS = tuple(range(1, 11))
+
+
+async def find_available_drivers(lat: float, lon: float, radius_km: float, limit: int) -> List[Tuple[str, float]]:
+    """Available drivers within radius, nearest first, as (driver_id, distance_km)."""
+    if settings.DRIVER_INDEX_ENABLED and driver_index.ready:
+        return driver_index.nearest(lat, lon, radius_km, limit)
+    
+    # Each shard's GEO and availability keys share a slot; query the
+    # shards the radius touches in parallel and merge the results
+    shards = shards_for(lat, lon, radius_km)
+    results = await asyncio.gather(*[
+        find_available_drivers_script(
+            keys=[geo_key(shard), available_key(shard)],
+            args=[lon, lat, radius_km, limit]
+        )
+        for shard in shards
+    ])
+    nearby = [(decode_val(raw_id), float(dist)) for result in results for raw_id, dist in result]
+    if len(shards) > 1:
+        nearby = heapq.nsmallest(limit, nearby, key=lambda item: item[1])
+    return nearby
+
+
+class DispatchScheduler:
+    """
+    Offer a ride request in expanding rings instead of to everyone at once.
+    
+    Each stage is (radius_km, max_drivers, wait_seconds): the nearest
+    max_drivers available drivers within radius_km get the offer (minus
+    those already offered), then the scheduler waits before widening to the
+    next stage. It stops when the request is accepted, and expires the
+    request once the last stage times out.
+    """
+    
+    def __init__(self, stages: List[Tuple[float, int, float]]):
+        self.stages = stages
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._accepted: Dict[str, asyncio.Event] = {}
+    
+    @property
+    def max_radius_km(self) -> float:
+        return self.stages[-1][0]
+    
+    @property
+    def max_drivers(self) -> int:
+        return self.stages[-1][1]
+    
+    async def _offer(self, request: dict, drivers: List[Tuple[str, float]]) -> int:
+        request_id = request["request_id"]
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.sadd(f"ride_request:{request_id}:drivers", *[d_id for d_id, _ in drivers])
+        pipe.expire(f"ride_request:{request_id}:drivers", settings.RIDE_REQUEST_TTL)
+        add_event(pipe, OFFERED, request_id=request_id, driver_ids=",".join(d_id for d_id, _ in drivers))
+        await pipe.execute()
+        
+        metrics.inc("dispatch_offers", len(drivers))
+        return await ws_manager.send_many_to_drivers({
+            driver_id: {
+                "type": "ride_request",
+                "request_id": request_id,
+                "passenger_id": request["passenger_id"],
+                "pickup_lat": request["pickup_lat"],
+                "pickup_lon": request["pickup_lon"],
+                "distance_km": round(distance, 2)
+            }
+            for driver_id, distance in drivers
+        })
+    
+    @staticmethod
+    def _stage_candidates(candidates: List[Tuple[str, float]], stage: Tuple[float, int, float],
+                          offered: Set[str]) -> List[Tuple[str, float]]:
+        radius_km, max_drivers, _ = stage
+        nearest = [(d_id, dist) for d_id, dist in candidates if dist <= radius_km][:max_drivers]
+        return [(d_id, dist) for d_id, dist in nearest if d_id not in offered]
+    
+    async def start(self, request: dict, candidates: List[Tuple[str, float]]) -> int:
+        """
+        Make the first-stage offer now and schedule the remaining stages.
+        
+        `candidates` are available drivers within the widest stage, nearest
+        first. Returns how many drivers the first stage reached.
+        """
+        offered: Set[str] = set()
+        first = []
+        stage_index = 0
+        # Skip ahead to the first stage that has anyone to offer to
+        while stage_index < len(self.stages):
+            first = self._stage_candidates(candidates, self.stages[stage_index], offered)
+            if first:
+                break
+            stage_index += 1
+        
+        notified = await self._offer(request, first) if first else 0
+        offered.update(d_id for d_id, _ in first)
+        
+        request_id = request["request_id"]
+        self._accepted[request_id] = asyncio.Event()
+        self._tasks[request_id] = asyncio.create_task(self._run(request, stage_index, offered))
+        return notified
+    
+    async def _run(self, request: dict, stage_index: int, offered: Set[str]):
+        request_id = request["request_id"]
+        accepted = self._accepted[request_id]
+        try:
+            while True:
+                wait = self.stages[min(stage_index, len(self.stages) - 1)][2]
+                try:
+                    await asyncio.wait_for(accepted.wait(), wait)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                
+                # Accepted on another node, or already gone
+                status = decode_val(await redis_conn.hget(f"ride_request:{request_id}", "status"))
+                if status != "pending":
+                    return
+                
+                stage_index += 1
+                if stage_index >= len(self.stages):
+                    await self._expire(request)
+                    return
+                
+                radius_km, max_drivers, _ = self.stages[stage_index]
+                candidates = await find_available_drivers(
+                    request["pickup_lat"], request["pickup_lon"], radius_km, max_drivers
+                )
+                drivers = self._stage_candidates(candidates, self.stages[stage_index], offered)
+                metrics.observe("dispatch_stage_reached", stage_index + 1, buckets=STAGE_BUCKETS)
+                if drivers:
+                    await self._offer(request, drivers)
+                    offered.update(d_id for d_id, _ in drivers)
+        except Exception as e:
+            print(f"❌ Dispatch for ride request {request_id} failed: {e}")
+        finally:
+            self._tasks.pop(request_id, None)
+            self._accepted.pop(request_id, None)
+    
+    async def _expire(self, request: dict):
+        """Give up on a request nobody accepted and tell the passenger."""
+        request_id = request["request_id"]
+        passenger_id = request["passenger_id"]
+        expired = await expire_ride_request_script(keys=[f"ride_request:{request_id}"])
+        if expired != 1:
+            return
+        await delete_if_equals_script(keys=[f"ride_request:passenger:{passenger_id}"], args=[request_id])
+        metrics.inc("dispatch_expired")
+        await emit_event(EXPIRED, request_id=request_id, passenger_id=passenger_id)
+        await ws_manager.send_to_passenger(passenger_id, {
+            "type": "no_driver_found",
+            "request_id": request_id
+        })
+    
+    def notify_accepted(self, request_id: str):
+        """Stop offering a request accepted on this node."""
+        event = self._accepted.get(request_id)
+        if event is not None:
+            event.set()
+    
+    async def stop(self):
+        """Cancel every running dispatch task."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global dispatch scheduler instance
+dispatcher = DispatchScheduler(settings.RIDE_DISPATCH_STAGES)
@@ -0,0 +1,239 @@
+import asyncio
+import heapq
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.driver_shards import available_key, geo_key, known_shards
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn, decode_val
+
+# Same constants Redis uses for GEO commands, so distances match GEOSEARCH
+EARTH_RADIUS_KM = 6372.797560856
+GEO_LAT_MIN, GEO_LAT_MAX = -85.05112878, 85.05112878
+GEO_LON_MIN, GEO_LON_MAX = -180.0, 180.0
+GEO_STEP = 26
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+SYNC_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _squash(x: int) -> int:
+    """Keep the even bits of a 52-bit interleaved hash, packed together."""
+    x &= 0x5555555555555555
+    x = (x | (x >> 1)) & 0x3333333333333333
+    x = (x | (x >> 2)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x >> 4)) & 0x00FF00FF00FF00FF
+    x = (x | (x >> 8)) & 0x0000FFFF0000FFFF
+    x = (x | (x >> 16)) & 0x00000000FFFFFFFF
+    return x
+
+
+def decode_geo_score(score: float) -> Tuple[float, float]:
+    """Decode a drivers_geo sorted-set score (Redis geohash) to (lon, lat)."""
+    bits = int(score)
+    lat_cell = _squash(bits)
+    lon_cell = _squash(bits >> 1)
+    cells = 1 << GEO_STEP
+    lat = GEO_LAT_MIN + (lat_cell + 0.5) * (GEO_LAT_MAX - GEO_LAT_MIN) / cells
+    lon = GEO_LON_MIN + (lon_cell + 0.5) * (GEO_LON_MAX - GEO_LON_MIN) / cells
+    return lon, lat
+
+
+class DriverIndex:
+    """
+    In-memory grid index of driver positions and availability.
+    
+    Drivers are bucketed into square cells of cell_km, so a nearest-driver
+    query only looks at the cells its radius covers instead of asking Redis.
+    Positions written by this node are applied after each location flush;
+    everything else (other nodes, removals) is picked up by a periodic full
+    sync from every drivers_geo and available_drivers shard, which also
+    reports how far the index had drifted from Redis.
+    """
+    
+    def __init__(self, cell_km: float, sync_interval: float):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.sync_interval = sync_interval
+        self.ready = False
+        self._positions: Dict[str, Tuple[float, float]] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._available: Set[str] = set()
+        # Local changes made while a sync is reading Redis, replayed on top of it
+        self._replay: Optional[List[tuple]] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def __len__(self):
+        return len(self._positions)
+    
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        return int(math.floor(lon / self.cell_deg)), int(math.floor(lat / self.cell_deg))
+    
+    def update(self, driver_id: str, lon: float, lat: float):
+        """Move a driver to a new position."""
+        if self._replay is not None:
+            self._replay.append(("update", driver_id, lon, lat))
+        old = self._positions.get(driver_id)
+        if old is not None:
+            old_cell = self._cell(*old)
+            if old_cell == self._cell(lon, lat):
+                self._positions[driver_id] = (lon, lat)
+                return
+            bucket = self._cells.get(old_cell)
+            if bucket is not None:
+                bucket.discard(driver_id)
+                if not bucket:
+                    del self._cells[old_cell]
+        self._positions[driver_id] = (lon, lat)
+        self._cells.setdefault(self._cell(lon, lat), set()).add(driver_id)
+    
+    def remove(self, driver_id: str):
+        """Drop a driver from the index."""
+        if self._replay is not None:
+            self._replay.append(("remove", driver_id))
+        self._available.discard(driver_id)
+        position = self._positions.pop(driver_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(driver_id)
+            if not bucket:
+                del self._cells[cell]
+    
+    def set_available(self, driver_id: str, available: bool):
+        """Mirror an available_drivers SADD/SREM made by this node."""
+        if self._replay is not None:
+            self._replay.append(("available", driver_id, available))
+        if available:
+            self._available.add(driver_id)
+        else:
+            self._available.discard(driver_id)
+    
+    def nearest(self, lat: float, lon: float, radius_km: float, limit: int) -> List[Tuple[str, float]]:
+        """Available drivers within radius, nearest first, as (driver_id, distance_km)."""
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + lat_span, 89.0))), 1e-6)
+        cx, cy = self._cell(lon, lat)
+        reach_x = int(lat_span / cos_lat / self.cell_deg) + 1
+        reach_y = int(lat_span / self.cell_deg) + 1
+        # Anything outside ring k is at least this far away, per ring
+        ring_km = self.cell_deg * KM_PER_DEGREE * cos_lat
+        
+        found = []
+        for ring in range(max(reach_x, reach_y) + 1):
+            for x in range(cx - min(ring, reach_x), cx + min(ring, reach_x) + 1):
+                edge = abs(x - cx) == ring
+                for y in range(cy - min(ring, reach_y), cy + min(ring, reach_y) + 1):
+                    if not edge and abs(y - cy) != ring:
+                        continue
+                    bucket = self._cells.get((x, y))
+                    if not bucket:
+                        continue
+                    for driver_id in bucket:
+                        if driver_id not in self._available:
+                            continue
+                        d_lon, d_lat = self._positions[driver_id]
+                        distance = haversine_km(lat, lon, d_lat, d_lon)
+                        if distance <= radius_km:
+                            found.append((driver_id, distance))
+            
+            # Stop widening once the k nearest found so far can't be beaten
+            if len(found) >= limit:
+                found = heapq.nsmallest(limit, found, key=lambda item: item[1])
+                if found[-1][1] <= ring * ring_km:
+                    break
+        
+        return heapq.nsmallest(limit, found, key=lambda item: item[1])
+    
+    async def sync(self):
+        """Rebuild the index from Redis and record how far it had drifted."""
+        started = time.perf_counter()
+        self._replay = []
+        try:
+            shards = await known_shards()
+            pipe = redis_conn.pipeline(transaction=False)
+            for shard in shards:
+                pipe.zrange(geo_key(shard), 0, -1, withscores=True)
+                pipe.smembers(available_key(shard))
+            results = await pipe.execute()
+        except Exception:
+            self._replay = None
+            raise
+        
+        positions = {}
+        available = set()
+        for members, shard_available in zip(results[::2], results[1::2]):
+            for raw_id, score in members:
+                positions[decode_val(raw_id)] = decode_geo_score(score)
+            available.update(shard_available)
+        replay, self._replay = self._replay, None
+        
+        # Consistency check against what we had before the rebuild
+        if self.ready:
+            missing = sum(1 for driver_id in positions if driver_id not in self._positions)
+            extra = sum(1 for driver_id in self._positions if driver_id not in positions)
+            drift = max(
+                (haversine_km(lat, lon, *self._positions[driver_id][::-1])
+                 for driver_id, (lon, lat) in positions.items() if driver_id in self._positions),
+                default=0.0
+            )
+            metrics.set_gauge("driver_index_missing", missing)
+            metrics.set_gauge("driver_index_extra", extra)
+            metrics.set_gauge("driver_index_max_drift_km", round(drift, 3))
+        
+        self._positions = {}
+        self._cells = {}
+        for driver_id, (lon, lat) in positions.items():
+            self.update(driver_id, lon, lat)
+        self._available = {decode_val(raw_id) for raw_id in available}
+        
+        for change in replay:
+            if change[0] == "update":
+                self.update(*change[1:])
+            elif change[0] == "remove":
+                self.remove(change[1])
+            else:
+                self.set_available(*change[1:])
+        
+        self.ready = True
+        metrics.set_gauge("driver_index_size", len(self._positions))
+        metrics.observe("driver_index_sync_seconds", time.perf_counter() - started, buckets=SYNC_SECONDS_BUCKETS)
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                metrics.inc("driver_index_sync_errors")
+                print(f"❌ Driver index sync failed: {e}")
+            await asyncio.sleep(self.sync_interval)
+    
+    def start(self):
+        """Start the periodic sync task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the sync task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global driver index instance (used when DRIVER_INDEX_ENABLED is on)
+driver_index = DriverIndex(settings.DRIVER_INDEX_CELL_KM, settings.DRIVER_INDEX_SYNC_INTERVAL)
@@ -0,0 +1,184 @@
+import math
+import time
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.redis_client import redis_conn, decode_val
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+KM_PER_DEGREE_LAT = 111.32
+
+# Registry of every shard that has held a driver, for sweeps and syncs
+SHARD_REGISTRY = "driver_shards"
+
+
+def _cell_counts(precision: int):
+    bits = precision * 5
+    return 1 << ((bits + 1) // 2), 1 << (bits // 2)  # lon cells, lat cells
+
+
+def _encode_cell(x: int, y: int, precision: int) -> str:
+    """Geohash of the cell at lon index x, lat index y."""
+    lon_bits = (precision * 5 + 1) // 2
+    lat_bits = (precision * 5) // 2
+    code = 0
+    # Geohash interleaves bits starting with longitude
+    for i in range(precision * 5):
+        if i % 2 == 0:
+            lon_bits -= 1
+            code = (code << 1) | ((x >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            code = (code << 1) | ((y >> lat_bits) & 1)
+    return "".join(
+        GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - i))) & 31]
+        for i in range(precision)
+    )
+
+
+def _cell_index(lon: float, lat: float, precision: int):
+    lon_cells, lat_cells = _cell_counts(precision)
+    x = min(int((lon + 180.0) / 360.0 * lon_cells), lon_cells - 1)
+    y = min(int((lat + 90.0) / 180.0 * lat_cells), lat_cells - 1)
+    return max(x, 0), max(y, 0)
+
+
+def shard_of(lon: float, lat: float) -> str:
+    """Shard a position belongs to; "" when sharding is off."""
+    precision = settings.DRIVER_SHARD_PRECISION
+    if precision <= 0:
+        return ""
+    return _encode_cell(*_cell_index(lon, lat, precision), precision)
+
+
+def shards_for(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Every shard a radius query around (lat, lon) can touch."""
+    precision = settings.DRIVER_SHARD_PRECISION
+    if precision <= 0:
+        return [""]
+    
+    lat_span = radius_km / KM_PER_DEGREE_LAT
+    lon_span = lat_span / max(math.cos(math.radians(min(abs(lat) + lat_span, 89.0))), 1e-6)
+    _, min_y = _cell_index(lon, max(lat - lat_span, -90.0), precision)
+    _, max_y = _cell_index(lon, min(lat + lat_span, 90.0), precision)
+    lon_cells, _ = _cell_counts(precision)
+    min_x = math.floor((lon - lon_span + 180.0) / 360.0 * lon_cells)
+    max_x = math.floor((lon + lon_span + 180.0) / 360.0 * lon_cells)
+    
+    # Longitude wraps at the antimeridian
+    xs = sorted({x % lon_cells for x in range(min_x, max_x + 1)})
+    return [_encode_cell(x, y, precision) for x in xs for y in range(min_y, max_y + 1)]
+
+
+# Per-shard keys share a {shard} hash tag so one shard's keys land in the
+# same Redis Cluster slot and can be used together in a script.
+def geo_key(shard: str) -> str:
+    return f"drivers_geo:{{{shard}}}" if shard else "drivers_geo"
+
+
+def available_key(shard: str) -> str:
+    return f"available_drivers:{{{shard}}}" if shard else "available_drivers"
+
+
+def last_seen_key(shard: str) -> str:
+    return f"drivers_last_seen:{{{shard}}}" if shard else "drivers_last_seen"
+
+
+async def known_shards() -> List[str]:
+    """Shards that may hold drivers."""
+    if settings.DRIVER_SHARD_PRECISION <= 0:
+        return [""]
+    return [decode_val(shard) for shard in await redis_conn.smembers(SHARD_REGISTRY)]
+
+
+class DriverShards:
+    """
+    Track which shard each driver connected to this node lives in.
+    
+    Availability changes and location writes both happen on the node that
+    holds the driver's socket, so that node keeps the driver's current shard
+    and availability and moves them between shards as they drive. The
+    shard is also stored on driver:{id} so a reconnect on another node
+    starts from the right shard.
+    """
+    
+    def __init__(self):
+        self._current: Dict[str, str] = {}
+        self._available: Set[str] = set()
+        self._registered: Set[str] = set()
+    
+    async def connect(self, driver_id: str):
+        """Mark a newly connected driver available and recover their shard."""
+        shard = decode_val(await redis_conn.hget(f"driver:{driver_id}", "shard"))
+        if shard is not None:
+            self._current[driver_id] = shard
+        await self.set_available(driver_id, True)
+        pipe = redis_conn.pipeline(transaction=False)
+        self.heartbeat(pipe, [driver_id], time.time())
+        await pipe.execute()
+    
+    def forget(self, driver_id: str):
+        """Drop local state for a driver whose socket went away."""
+        self._current.pop(driver_id, None)
+        self._available.discard(driver_id)
+    
+    def shard(self, driver_id: str) -> Optional[str]:
+        return self._current.get(driver_id)
+    
+    def available_key_for(self, driver_id: str) -> Optional[str]:
+        """The available set a driver belongs in, or None before their first location."""
+        shard = self._current.get(driver_id)
+        if shard is None and settings.DRIVER_SHARD_PRECISION <= 0:
+            shard = ""
+        return None if shard is None else available_key(shard)
+    
+    def mark(self, driver_id: str, available: bool):
+        """Record availability locally, for a change already written to Redis."""
+        if available:
+            self._available.add(driver_id)
+        else:
+            self._available.discard(driver_id)
+    
+    async def set_available(self, driver_id: str, available: bool):
+        """Add a driver to or remove them from their shard's available set."""
+        self.mark(driver_id, available)
+        key = self.available_key_for(driver_id)
+        if key is None:
+            return  # added to a shard on the first location flush
+        if available:
+            await redis_conn.sadd(key, driver_id)
+        else:
+            await redis_conn.srem(key, driver_id)
+    
+    def move(self, pipe, driver_id: str, shard: str):
+        """Queue the writes that move a driver into shard, if they aren't there yet."""
+        old = self._current.get(driver_id)
+        if old == shard:
+            return
+        if old is not None:
+            pipe.zrem(geo_key(old), driver_id)
+            pipe.zrem(last_seen_key(old), driver_id)
+            pipe.srem(available_key(old), driver_id)
+        if shard and shard not in self._registered:
+            pipe.sadd(SHARD_REGISTRY, shard)
+            self._registered.add(shard)
+        self._current[driver_id] = shard
+    
+    def is_available(self, driver_id: str) -> bool:
+        return driver_id in self._available
+    
+    def heartbeat(self, pipe, driver_ids, now: float):
+        """Queue last-seen updates for drivers, grouped by their shard."""
+        by_shard: Dict[str, Dict[str, float]] = {}
+        for driver_id in driver_ids:
+            shard = self._current.get(driver_id)
+            if shard is None and settings.DRIVER_SHARD_PRECISION <= 0:
+                shard = ""
+            if shard is not None:
+                by_shard.setdefault(shard, {})[driver_id] = now
+        for shard, members in by_shard.items():
+            pipe.zadd(last_seen_key(shard), members)
+
+
+# Global driver shard tracker instance
+driver_shards = DriverShards()
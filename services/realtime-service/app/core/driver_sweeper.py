@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.driver_index import driver_index
+from app.core.driver_shards import available_key, geo_key, known_shards, last_seen_key
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn, decode_val
+from app.core.redis_scripts import evict_stale_drivers_script
+
+
+class DriverSweeper:
+    """
+    Periodically evict drivers that stopped sending heartbeats.
+    
+    Location flushes, presence refreshes and connects stamp each driver in
+    their shard's drivers_last_seen sorted set. Drivers not seen for
+    stale_after seconds are removed from drivers_geo and available_drivers
+    in batches, so crashed nodes and dropped sockets don't leave ghost
+    drivers behind. Every node runs a sweeper; the eviction script is
+    atomic, so they don't step on each other.
+    """
+    
+    def __init__(self, interval: float, stale_after: float, batch_size: int):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _seed(self):
+        """Give drivers already in drivers_geo a heartbeat so they can age out."""
+        now = time.time()
+        for shard in await known_shards():
+            batch = {}
+            async for raw_id, _ in redis_conn.zscan_iter(geo_key(shard), count=self.batch_size):
+                batch[decode_val(raw_id)] = now
+                if len(batch) >= self.batch_size:
+                    await redis_conn.zadd(last_seen_key(shard), batch, nx=True)
+                    batch = {}
+            if batch:
+                await redis_conn.zadd(last_seen_key(shard), batch, nx=True)
+    
+    async def _sweep_shard(self, shard: str, cutoff: float) -> int:
+        evicted = 0
+        while True:
+            stale = await evict_stale_drivers_script(
+                keys=[last_seen_key(shard), geo_key(shard), available_key(shard)],
+                args=[cutoff, self.batch_size]
+            )
+            for raw_id in stale:
+                driver_index.remove(decode_val(raw_id))
+            evicted += len(stale)
+            if len(stale) < self.batch_size:
+                return evicted
+            # Let other work run between batches
+            await asyncio.sleep(0)
+    
+    async def sweep(self) -> int:
+        """Evict every stale driver; returns how many were removed."""
+        cutoff = time.time() - self.stale_after
+        shards = await known_shards()
+        evicted = 0
+        for shard in shards:
+            evicted += await self._sweep_shard(shard, cutoff)
+        
+        metrics.inc("drivers_evicted", evicted)
+        pipe = redis_conn.pipeline(transaction=False)
+        for shard in shards:
+            pipe.zcard(geo_key(shard))
+            pipe.scard(available_key(shard))
+        sizes = await pipe.execute()
+        metrics.set_gauge("drivers_geo_size", sum(sizes[::2]))
+        metrics.set_gauge("available_drivers_size", sum(sizes[1::2]))
+        
+        if evicted:
+            print(f"🧹 Evicted {evicted} stale drivers")
+        return evicted
+    
+    async def _run(self):
+        try:
+            await self._seed()
+        except Exception as e:
+            print(f"⚠️ Failed to seed driver heartbeats: {e}")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                metrics.inc("driver_sweep_errors")
+                print(f"❌ Stale driver sweep failed: {e}")
+    
+    def start(self):
+        """Start the periodic sweep task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the sweep task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global driver sweeper instance
+driver_sweeper = DriverSweeper(
+    settings.DRIVER_SWEEP_INTERVAL,
+    settings.DRIVER_STALE_AFTER,
+    settings.DRIVER_SWEEP_BATCH
+)
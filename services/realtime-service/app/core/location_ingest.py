@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.driver_index import driver_index
+from app.core.driver_shards import available_key, driver_shards, geo_key, shard_of
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn
+from app.core.ride_cache import ride_cache
+from app.core.ride_events import add_location
+from app.core.websocket_manager import ws_manager
+
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class LocationIngest:
+    """
+    Buffer driver location updates and write them to Redis in batches.
+    
+    Only the latest position per driver is kept between flushes; older
+    updates for the same driver are dropped (coalesced). Each flush is one
+    pipeline with a GEOADD and heartbeat ZADD per shard plus one HSET per
+    driver. Updates from drivers who have since disconnected are dropped,
+    so a late flush can't put them back into a shard or available set.
+    """
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Tuple[float, float, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def submit(self, driver_id: str, lon: float, lat: float, status: str):
+        """Queue a location update for the next flush."""
+        if driver_id in self._pending:
+            metrics.inc("location_updates_coalesced")
+        self._pending[driver_id] = (lon, lat, status)
+        metrics.inc("location_updates_received")
+    
+    def discard(self, driver_id: str):
+        """Drop a driver's buffered update, e.g. when their socket closes."""
+        self._pending.pop(driver_id, None)
+    
+    async def flush(self):
+        """Write all buffered updates to Redis in one pipeline."""
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, {}
+        batch = {
+            driver_id: update for driver_id, update in batch.items()
+            if driver_id in ws_manager.driver_connections
+        }
+        if not batch:
+            return
+        started = time.perf_counter()
+        
+        now = time.time()
+        pipe = redis_conn.pipeline(transaction=False)
+        geo_values: Dict[str, list] = {}
+        available: Dict[str, list] = {}
+        for driver_id, (lon, lat, status) in batch.items():
+            shard = shard_of(lon, lat)
+            driver_shards.move(pipe, driver_id, shard)
+            geo_values.setdefault(shard, []).extend((lon, lat, driver_id))
+            # Re-asserting availability repairs drivers an eviction raced with
+            if driver_shards.is_available(driver_id):
+                available.setdefault(shard, []).append(driver_id)
+            # Positions during a ride go to the ride locations stream
+            passenger_id = ride_cache.get(driver_id)
+            if passenger_id:
+                add_location(
+                    pipe,
+                    request_id=ride_cache.request_id(driver_id),
+                    driver_id=driver_id,
+                    passenger_id=passenger_id,
+                    lat=lat,
+                    lon=lon
+                )
+            pipe.hset(
+                f"driver:{driver_id}",
+                mapping={
+                    "lat": lat,
+                    "lon": lon,
+                    "status": status,
+                    "shard": shard
+                }
+            )
+        for shard, values in geo_values.items():
+            pipe.geoadd(geo_key(shard), values)
+        for shard, driver_ids in available.items():
+            pipe.sadd(available_key(shard), *driver_ids)
+        driver_shards.heartbeat(pipe, batch, now)
+        
+        try:
+            await pipe.execute()
+        except Exception as e:
+            metrics.inc("location_flush_errors")
+            print(f"❌ Failed to flush {len(batch)} driver locations: {e}")
+            return
+        
+        # A driver who disconnected while the pipeline was in flight may have
+        # been re-added after their disconnect removed them; take them out again
+        gone = [driver_id for driver_id in batch if driver_id not in ws_manager.driver_connections]
+        if gone:
+            pipe = redis_conn.pipeline(transaction=False)
+            for driver_id in gone:
+                pipe.srem(available_key(shard_of(*batch[driver_id][:2])), driver_id)
+            try:
+                await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Failed to clear {len(gone)} disconnected drivers: {e}")
+            batch = {driver_id: update for driver_id, update in batch.items() if driver_id not in gone}
+        
+        if settings.DRIVER_INDEX_ENABLED:
+            for driver_id, (lon, lat, _) in batch.items():
+                driver_index.update(driver_id, lon, lat)
+        
+        metrics.observe("location_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        metrics.observe("location_flush_seconds", time.perf_counter() - started)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    def start(self):
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush task and write out anything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Global location ingest instance
+location_ingest = LocationIngest(settings.LOCATION_FLUSH_INTERVAL_MS / 1000)
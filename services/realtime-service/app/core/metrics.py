@@ -0,0 +1,67 @@
+from typing import Dict, List, Sequence
+import bisect
+
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts are computed on snapshot)."""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        """Record a single observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def snapshot(self) -> dict:
+        """Return a JSON-friendly view of the histogram."""
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Metrics:
+    """In-process counters, gauges and histograms for the realtime service."""
+    
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+    
+    def inc(self, name: str, amount: int = 1):
+        """Increment a counter."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to the given value."""
+        self.gauges[name] = value
+    
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """Record a histogram observation, creating the histogram on first use."""
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(buckets)
+        hist.observe(value)
+    
+    def snapshot(self) -> dict:
+        """Return all metrics as a JSON-friendly dict."""
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,65 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple, Union
+
+
+class OutboundQueue:
+    """
+    Bounded queue of serialized frames waiting to be written to one socket.
+    
+    Messages are either droppable (location updates) or not (ride state).
+    When the queue is full, the oldest droppable message makes room. If
+    every queued message is ride state, a new droppable message is
+    discarded, and a new ride-state message waits for room, up to a timeout.
+    """
+    
+    def __init__(self, maxsize: int, on_drop: Optional[Callable[[bool], None]] = None):
+        self.maxsize = maxsize
+        self._items: Deque[Tuple[Union[str, bytes], bool]] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._on_drop = on_drop
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def _dropped(self, was_queued: bool):
+        if self._on_drop is not None:
+            self._on_drop(was_queued)
+    
+    def _drop_oldest_droppable(self) -> bool:
+        for i, (_, droppable) in enumerate(self._items):
+            if droppable:
+                del self._items[i]
+                self._dropped(True)
+                return True
+        return False
+    
+    async def put(self, data: Union[str, bytes], droppable: bool, timeout: float) -> bool:
+        """
+        Queue a message; returns False if a droppable message was discarded.
+        
+        Raises asyncio.TimeoutError if a ride-state message could not be
+        queued within the timeout.
+        """
+        if len(self._items) >= self.maxsize and not self._drop_oldest_droppable():
+            if droppable:
+                self._dropped(False)
+                return False
+            while len(self._items) >= self.maxsize:
+                self._not_full.clear()
+                await asyncio.wait_for(self._not_full.wait(), timeout)
+        
+        self._items.append((data, droppable))
+        self._not_empty.set()
+        return True
+    
+    async def get(self) -> Union[str, bytes]:
+        """Wait for and return the next frame to write."""
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        data, _ = self._items.popleft()
+        self._not_full.set()
+        return data
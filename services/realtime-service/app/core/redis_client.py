@@ -1,13 +1,16 @@
-import redis
+import redis.asyncio as redis
 from app.core.config import settings
 
-# Redis connection
-redis_conn = redis.Redis(
+# Redis connection (async, bounded pool shared by all handlers)
+redis_pool = redis.BlockingConnectionPool(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT,
     decode_responses=False  # Keep bytes for compatibility
 )
+redis_conn = redis.Redis(connection_pool=redis_pool)
 
 
 def decode_val(v):
@@ -1,19 +1,183 @@
-from app.core.redis_client import redis_conn
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
 
+import orjson
 
-def listen_to_redis():
-    """Listen to Redis pub/sub for ride events."""
-    pub = redis_conn.pubsub()
-    pub.subscribe("ride_channel")
-    print("✅ Subscribed to Redis ride_channel...")
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import redis_conn, decode_val
+from app.core.ride_cache import RIDE_STATE_CHANNEL, ride_cache
+from app.core.websocket_manager import BROADCAST_CHANNEL, NODE_ID, node_channel, ws_manager
+from app.schemas.events import (
+    BroadcastEvent,
+    LocationForwardEvent,
+    RideAssignedEvent,
+    RideCancelledEvent,
+)
+
+# Channel other services publish ride events to
+RIDE_CHANNEL = "ride_channel"
+
+
+async def handle_ride_assigned(data: dict):
+    """Tell both sides of a ride assigned by another service."""
+    event = RideAssignedEvent.model_validate(data)
+    if event.driver_id in ws_manager.driver_connections:
+        ride_cache.set(event.driver_id, event.passenger_id, event.request_id)
+    await ws_manager.send_local("passenger", event.passenger_id, {
+        "type": "driver_assigned",
+        "driver_id": event.driver_id,
+        "pickup_lat": event.pickup_lat,
+        "pickup_lon": event.pickup_lon
+    })
+    await ws_manager.send_local("driver", event.driver_id, {
+        "type": "ride_confirmed",
+        "passenger_id": event.passenger_id,
+        "pickup_lat": event.pickup_lat,
+        "pickup_lon": event.pickup_lon,
+        "request_id": event.request_id
+    })
+
+
+async def handle_ride_cancelled(data: dict):
+    """Tell both sides that a ride was cancelled."""
+    event = RideCancelledEvent.model_validate(data)
+    payload = {"type": "ride_cancelled", "request_id": event.request_id, "reason": event.reason}
+    if event.driver_id:
+        ride_cache.clear(event.driver_id)
+        await ws_manager.send_local("driver", event.driver_id, payload)
+    if event.passenger_id:
+        await ws_manager.send_local("passenger", event.passenger_id, payload)
+
+
+async def handle_location_forward(data: dict):
+    """Forward a driver position to a passenger."""
+    event = LocationForwardEvent.model_validate(data)
+    await ws_manager.send_local("passenger", event.passenger_id, {
+        "type": "driver_location_update",
+        "driver_id": event.driver_id,
+        "lat": event.lat,
+        "lon": event.lon
+    })
+
+
+async def handle_broadcast(data: dict):
+    """Send a payload to every driver connected to this node."""
+    event = BroadcastEvent.model_validate(data)
+    await ws_manager.broadcast_to_local_drivers(event.payload, event.exclude_driver_id)
+
+
+# Handlers for events published on ride_channel, keyed by event "type"
+EVENT_HANDLERS: Dict[str, Callable[[dict], Awaitable[None]]] = {
+    "ride_assigned": handle_ride_assigned,
+    "ride_cancelled": handle_ride_cancelled,
+    "location_forward": handle_location_forward,
+    "broadcast": handle_broadcast,
+}
+
+
+class RedisListener:
+    """
+    Consume Redis pub/sub on the event loop and dispatch to local sockets.
+    
+    A reader task pushes messages into a bounded queue and a dispatcher
+    task drains it in order. When sockets are slow the queue fills and the
+    reader waits, instead of buffering without limit. If the pub/sub
+    connection drops, the reader resubscribes with backoff and reloads the
+    ride cache, since changes published in the gap were missed.
+    """
     
-    for msg in pub.listen():
-        if msg["type"] == "message":
+    def __init__(self, queue_size: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._own_channel = node_channel(NODE_ID)
+        self._pubsub = None
+        self._tasks = []
+    
+    async def _subscribe(self):
+        self._pubsub = redis_conn.pubsub()
+        await self._pubsub.subscribe(RIDE_CHANNEL, RIDE_STATE_CHANNEL, self._own_channel, BROADCAST_CHANNEL)
+    
+    async def _close_pubsub(self):
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+    
+    async def _read(self):
+        backoff = 1
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    # Ride state changes published meanwhile were missed
+                    await ride_cache.reload(list(ws_manager.driver_connections))
+                    metrics.inc("pubsub_resubscribed")
+                    print(f"✅ Resubscribed to Redis {RIDE_CHANNEL}, {RIDE_STATE_CHANNEL}, {self._own_channel}...")
+                    backoff = 1
+                async for msg in self._pubsub.listen():
+                    if msg["type"] != "message":
+                        continue
+                    await self._queue.put((decode_val(msg["channel"]), decode_val(msg["data"])))
+                raise ConnectionError("pub/sub connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Redis pub/sub failed, resubscribing in {backoff}s: {e}")
+                await self._close_pubsub()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+    
+    async def _dispatch_loop(self):
+        while True:
+            channel, data = await self._queue.get()
+            metrics.set_gauge("pubsub_queue_depth", self._queue.qsize())
             try:
-                data = msg["data"]
-                if isinstance(data, bytes):
-                    data = data.decode()
-                print("📨 Redis message →", data)
-                # Process message if needed
+                await self.dispatch(channel, data)
             except Exception as e:
-                print(f"❌ Error processing Redis message: {e}")
+                print(f"❌ Error processing Redis message on {channel}: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def dispatch(self, channel: str, data: str):
+        """Route one pub/sub message to its handler."""
+        if channel == RIDE_STATE_CHANNEL:
+            ride_cache.apply(data)
+        elif channel == self._own_channel:
+            await ws_manager.deliver_node_message(data)
+        elif channel == BROADCAST_CHANNEL:
+            await ws_manager.deliver_broadcast(data)
+        elif channel == RIDE_CHANNEL:
+            event = orjson.loads(data)
+            handler = EVENT_HANDLERS.get(event.get("type"))
+            if handler is None:
+                print(f"⚠️ Unknown ride event type: {event.get('type')}")
+                return
+            await handler(event)
+    
+    async def start(self):
+        """Subscribe and start the reader and dispatcher tasks."""
+        await self._subscribe()
+        self._tasks = [
+            asyncio.create_task(self._read()),
+            asyncio.create_task(self._dispatch_loop()),
+        ]
+        print(f"✅ Subscribed to Redis {RIDE_CHANNEL}, {RIDE_STATE_CHANNEL}, {self._own_channel}...")
+    
+    async def stop(self):
+        """Cancel the tasks and release the pub/sub connection."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe()
+            except Exception:
+                pass
+        await self._close_pubsub()
+
+
+# Global Redis listener instance
+redis_listener = RedisListener(settings.PUBSUB_QUEUE_SIZE)
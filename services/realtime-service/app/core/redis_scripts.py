@@ -0,0 +1,127 @@
+from app.core.redis_client import redis_conn
+
+
+# Nearby drivers within radius that are also in the available set.
+# KEYS: geo key, availability set
+# ARGV: lon, lat, radius_km, limit
+# Returns [[driver_id, distance_km], ...] sorted nearest first.
+FIND_AVAILABLE_DRIVERS = """
+local nearby = redis.call('GEOSEARCH', KEYS[1], 'FROMLONLAT', ARGV[1], ARGV[2],
+    'BYRADIUS', ARGV[3], 'km', 'ASC', 'WITHDIST')
+local limit = tonumber(ARGV[4])
+local result = {}
+for _, item in ipairs(nearby) do
+    if redis.call('SISMEMBER', KEYS[2], item[1]) == 1 then
+        result[#result + 1] = item
+        if #result >= limit then break end
+    end
+end
+return result
+"""
+
+find_available_drivers_script = redis_conn.register_script(FIND_AVAILABLE_DRIVERS)
+
+# Delete a key only if it still holds the given value: a presence key still
+# owned by this node (a client that reconnected elsewhere keeps its new
+# registration), or a passenger index still pointing at this request.
+# KEYS: key
+# ARGV: expected value
+DELETE_IF_EQUALS = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+delete_if_equals_script = redis_conn.register_script(DELETE_IF_EQUALS)
+
+# Extend a presence key only while it still belongs to this node; a client
+# that reconnected elsewhere keeps its new registration. A key that expired
+# (e.g. during a Redis outage) is re-created, but never taken from another node.
+# KEYS: presence key
+# ARGV: node id, ttl seconds
+# Returns 1 if the key is held by this node afterwards, 0 otherwise.
+REFRESH_PRESENCE = """
+local owner = redis.call('GET', KEYS[1])
+if owner == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+refresh_presence_script = redis_conn.register_script(REFRESH_PRESENCE)
+
+# Drop a ride request that is still pending. The caller then clears the
+# passenger index with DELETE_IF_EQUALS (it lives in another hash slot).
+# KEYS: request hash
+# Returns 1 if the request was expired, 0 if it was already taken or gone.
+EXPIRE_RIDE_REQUEST = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'pending' then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+expire_ride_request_script = redis_conn.register_script(EXPIRE_RIDE_REQUEST)
+
+# Evict drivers whose last heartbeat is older than the cutoff, oldest first.
+# KEYS: last-seen sorted set, geo key, availability set
+# ARGV: cutoff timestamp, max drivers to evict
+# Returns the evicted driver ids.
+EVICT_STALE_DRIVERS = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #stale == 0 then
+    return stale
+end
+redis.call('ZREM', KEYS[1], unpack(stale))
+redis.call('ZREM', KEYS[2], unpack(stale))
+redis.call('SREM', KEYS[3], unpack(stale))
+return stale
+"""
+
+evict_stale_drivers_script = redis_conn.register_script(EVICT_STALE_DRIVERS)
+
+# Claim a pending ride request for a driver. Only the claim has to be atomic;
+# the driver's and passenger's ride state live in other hash slots and are
+# written by the caller afterwards, so this script touches a single key and
+# is safe on Redis Cluster.
+# KEYS: request hash
+# ARGV: driver id, ride state TTL seconds
+# Returns -1 if the request is gone, 0 if it is no longer pending,
+# otherwise the request hash as a flat [field, value, ...] list.
+ASSIGN_RIDE = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status then return -1 end
+if status ~= 'pending' then return 0 end
+
+redis.call('HSET', KEYS[1], 'status', 'assigned', 'driver_id', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+assign_ride_script = redis_conn.register_script(ASSIGN_RIDE)
+
+# Mark an assigned ride completed if this driver holds it. Like ASSIGN_RIDE
+# this touches a single key; the caller then deletes the request and the
+# rest of the ride state and emits the completed event in one pipeline.
+# A retry after a failure in between finds the ride already completed by
+# the same driver and gets the same record back, so the event isn't lost.
+# KEYS: request hash
+# ARGV: driver id, completed_at
+# Returns -1 if the request is gone or not assigned to this driver,
+# otherwise the request hash as a flat [field, value, ...] list.
+COMPLETE_RIDE = """
+local driver, status = unpack(redis.call('HMGET', KEYS[1], 'driver_id', 'status'))
+if driver ~= ARGV[1] then return -1 end
+if status ~= 'completed' then
+    redis.call('HSET', KEYS[1], 'status', 'completed', 'completed_at', ARGV[2])
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+complete_ride_script = redis_conn.register_script(COMPLETE_RIDE)
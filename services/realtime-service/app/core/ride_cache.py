@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional
+
+import orjson
+
+from app.core.redis_client import redis_conn, decode_val
+from app.core.websocket_manager import ws_manager
+
+# Pub/sub channel used to keep ride caches on other nodes in sync
+RIDE_STATE_CHANNEL = "ride_state_channel"
+
+
+class DriverRideCache:
+    """
+    In-process cache of which passenger (and ride request) each connected
+    driver is serving.
+    
+    Lets the location hot path decide whether to forward a ping without
+    reading ride:driver:{id} from Redis. Filled on connect and on accept,
+    cleared on completion and disconnect; changes are published so other
+    nodes drop stale entries.
+    """
+    
+    def __init__(self):
+        self._passenger_by_driver: Dict[str, str] = {}
+        self._request_by_driver: Dict[str, str] = {}
+    
+    def get(self, driver_id: str) -> Optional[str]:
+        """Return the passenger the driver is serving, if any."""
+        return self._passenger_by_driver.get(driver_id)
+    
+    def request_id(self, driver_id: str) -> Optional[str]:
+        """Return the ride request the driver is serving, if known."""
+        return self._request_by_driver.get(driver_id)
+    
+    def set(self, driver_id: str, passenger_id: str, request_id: Optional[str] = None):
+        """Record the driver's active ride locally."""
+        self._passenger_by_driver[driver_id] = passenger_id
+        if request_id:
+            self._request_by_driver[driver_id] = request_id
+        else:
+            self._request_by_driver.pop(driver_id, None)
+    
+    def clear(self, driver_id: str):
+        """Forget the driver's active ride locally."""
+        self._passenger_by_driver.pop(driver_id, None)
+        self._request_by_driver.pop(driver_id, None)
+    
+    async def reload(self, driver_ids: List[str]):
+        """Rebuild the cache from Redis, after changes may have been missed."""
+        pipe = redis_conn.pipeline(transaction=False)
+        for driver_id in driver_ids:
+            pipe.hmget(f"ride:driver:{driver_id}", "passenger_id", "request_id")
+        rides = await pipe.execute() if driver_ids else []
+        self._passenger_by_driver = {}
+        self._request_by_driver = {}
+        for driver_id, (passenger_id, request_id) in zip(driver_ids, rides):
+            if passenger_id:
+                self.set(driver_id, decode_val(passenger_id), decode_val(request_id))
+    
+    async def assign(self, driver_id: str, passenger_id: str, request_id: str):
+        """Record the driver's active ride and notify other nodes."""
+        self.set(driver_id, passenger_id, request_id)
+        await self._publish(driver_id, passenger_id, request_id)
+    
+    async def release(self, driver_id: str):
+        """Clear the driver's active ride and notify other nodes."""
+        self.clear(driver_id)
+        await self._publish(driver_id, None, None)
+    
+    def apply(self, data: str):
+        """Apply a ride state change published by any node."""
+        change = orjson.loads(data)
+        driver_id = change.get("driver_id")
+        if not driver_id:
+            return
+        if change.get("passenger_id"):
+            # Only drivers connected to this node are worth caching
+            if driver_id in ws_manager.driver_connections:
+                self.set(driver_id, change["passenger_id"], change.get("request_id"))
+        else:
+            self.clear(driver_id)
+    
+    async def _publish(self, driver_id: str, passenger_id: Optional[str], request_id: Optional[str]):
+        try:
+            await redis_conn.publish(
+                RIDE_STATE_CHANNEL,
+                orjson.dumps({"driver_id": driver_id, "passenger_id": passenger_id, "request_id": request_id})
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to publish ride state for driver {driver_id}: {e}")
+
+
+# Global driver ride cache instance
+ride_cache = DriverRideCache()
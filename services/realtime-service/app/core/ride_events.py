@@ -0,0 +1,51 @@
+import time
+
+from app.core.config import settings
+from app.core.redis_client import redis_conn
+
+# Lifecycle event types written to the ride events stream
+REQUESTED = "requested"
+OFFERED = "offered"
+ASSIGNED = "assigned"
+LOCATION = "location"  # written to the separate ride locations stream
+COMPLETED = "completed"
+EXPIRED = "expired"
+
+
+def _entry(event_type: str, fields: dict) -> dict:
+    entry = {"type": event_type, "ts": time.time()}
+    entry.update((key, value) for key, value in fields.items() if value is not None)
+    return entry
+
+
+def add_event(pipe, event_type: str, **fields):
+    """Queue a ride lifecycle event on a pipeline."""
+    pipe.xadd(
+        settings.RIDE_EVENTS_STREAM,
+        _entry(event_type, fields),
+        maxlen=settings.RIDE_STREAM_MAXLEN,
+        approximate=True
+    )
+
+
+def add_location(pipe, **fields):
+    """Queue an on-ride driver position on a pipeline."""
+    pipe.xadd(
+        settings.RIDE_LOCATIONS_STREAM,
+        _entry(LOCATION, fields),
+        maxlen=settings.RIDE_LOCATIONS_MAXLEN,
+        approximate=True
+    )
+
+
+async def emit_event(event_type: str, **fields):
+    """Append a single ride lifecycle event to the stream."""
+    try:
+        await redis_conn.xadd(
+            settings.RIDE_EVENTS_STREAM,
+            _entry(event_type, fields),
+            maxlen=settings.RIDE_STREAM_MAXLEN,
+            approximate=True
+        )
+    except Exception as e:
+        print(f"⚠️ Failed to emit {event_type} ride event: {e}")
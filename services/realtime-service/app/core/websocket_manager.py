@@ -1,72 +1,354 @@
-from typing import Dict
+from typing import Dict, List, Optional, Tuple, Union
 from fastapi import WebSocket
-import json
+import asyncio
+import orjson
+import os
+import socket
+import time
+
+from app.core.config import settings
+from app.core.driver_shards import driver_shards
+from app.core.metrics import metrics
+from app.core.outbound_queue import OutboundQueue
+from app.core.redis_client import redis_conn, decode_val
+from app.core.redis_scripts import delete_if_equals_script, refresh_presence_script
+from app.core import wire
+
+# Identifies this replica in the presence registry and node channels
+NODE_ID = settings.NODE_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+# Message types that may be dropped when a client's outbound queue is full
+DROPPABLE_MESSAGE_TYPES = {"driver_location_update"}
+
+# Every node listens here for broadcasts originating on other nodes
+BROADCAST_CHANNEL = "ws:broadcast"
+
+
+def node_channel(node_id: str) -> str:
+    """Pub/sub channel that delivers messages to sockets held by one node."""
+    return f"ws:node:{node_id}"
+
+
+def presence_key(role: str, client_id: str) -> str:
+    """Redis key recording which node holds a client's socket."""
+    return f"ws:presence:{role}:{client_id}"
+
+
+class ClientConnection:
+    """A connected socket with its outbound queue and writer task."""
+    
+    def __init__(self, websocket: WebSocket, queue: OutboundQueue, protocol: Optional[str] = None):
+        self.websocket = websocket
+        self.queue = queue
+        self.protocol = protocol
+        self.writer: Optional[asyncio.Task] = None
+        self.send_timeouts = 0
 
 
 class WebSocketManager:
-    """Manage WebSocket connections for drivers and passengers."""
+    """
+    Manage WebSocket connections for drivers and passengers.
+    
+    Sockets live on whichever replica accepted them. Each connection is
+    registered in Redis (ws:presence:{role}:{id} -> node id) so a message
+    for a client on another replica is published to that node's channel
+    and delivered there by the Redis listener.
+    
+    Nothing writes to a socket directly: messages go into the connection's
+    bounded OutboundQueue and a dedicated writer task sends them in order.
+    """
     
     def __init__(self):
-        self.driver_connections: Dict[str, WebSocket] = {}
-        self.passenger_connections: Dict[str, WebSocket] = {}
+        self.driver_connections: Dict[str, ClientConnection] = {}
+        self.passenger_connections: Dict[str, ClientConnection] = {}
+        self._presence_task: Optional[asyncio.Task] = None
+        self._queued: Dict[str, int] = {"driver": 0, "passenger": 0}
+    
+    def _connections(self, role: str) -> Dict[str, ClientConnection]:
+        return self.driver_connections if role == "driver" else self.passenger_connections
+    
+    def _local_clients(self):
+        return ([("driver", driver_id) for driver_id in self.driver_connections]
+                + [("passenger", passenger_id) for passenger_id in self.passenger_connections])
     
-    async def connect_driver(self, driver_id: str, websocket: WebSocket):
+    async def _register(self, role: str, client_id: str):
+        await redis_conn.set(presence_key(role, client_id), NODE_ID, ex=settings.WS_PRESENCE_TTL)
+    
+    async def _unregister(self, role: str, client_id: str):
+        try:
+            await delete_if_equals_script(keys=[presence_key(role, client_id)], args=[NODE_ID])
+        except Exception as e:
+            print(f"⚠️ Failed to release presence for {role} {client_id}: {e}")
+    
+    async def _connect(self, role: str, client_id: str, websocket: WebSocket) -> ClientConnection:
+        protocol = wire.choose_subprotocol(websocket.scope.get("subprotocols"))
+        await websocket.accept(subprotocol=protocol)
+        
+        # A reconnect replaces the old socket; stop its writer first
+        previous = self._connections(role).pop(client_id, None)
+        if previous is not None:
+            self._close_connection(role, previous)
+        
+        def on_drop(was_queued: bool):
+            metrics.inc(f"ws_outbound_dropped_{role}")
+            if was_queued:
+                self._track_depth(role, -1)
+        
+        conn = ClientConnection(websocket, OutboundQueue(settings.WS_OUTBOUND_QUEUE_SIZE, on_drop), protocol)
+        conn.writer = asyncio.create_task(self._write_loop(role, client_id, conn))
+        self._connections(role)[client_id] = conn
+        await self._register(role, client_id)
+        return conn
+    
+    async def connect_driver(self, driver_id: str, websocket: WebSocket) -> ClientConnection:
         """Connect a driver WebSocket."""
-        await websocket.accept()
-        self.driver_connections[driver_id] = websocket
+        return await self._connect("driver", driver_id, websocket)
     
-    async def connect_passenger(self, passenger_id: str, websocket: WebSocket):
+    async def connect_passenger(self, passenger_id: str, websocket: WebSocket) -> ClientConnection:
         """Connect a passenger WebSocket."""
-        await websocket.accept()
-        self.passenger_connections[passenger_id] = websocket
+        return await self._connect("passenger", passenger_id, websocket)
     
-    def disconnect_driver(self, driver_id: str):
-        """Disconnect a driver."""
-        self.driver_connections.pop(driver_id, None)
+    async def disconnect_driver(self, driver_id: str, conn: Optional[ClientConnection] = None) -> bool:
+        """Disconnect a driver; with conn, only while that connection is still theirs."""
+        return await self._disconnect("driver", driver_id, conn)
     
-    def disconnect_passenger(self, passenger_id: str):
-        """Disconnect a passenger."""
-        self.passenger_connections.pop(passenger_id, None)
+    async def disconnect_passenger(self, passenger_id: str, conn: Optional[ClientConnection] = None) -> bool:
+        """Disconnect a passenger; with conn, only while that connection is still theirs."""
+        return await self._disconnect("passenger", passenger_id, conn)
     
-    async def send_to_driver(self, driver_id: str, payload: dict):
-        """Send message to a specific driver."""
-        ws = self.driver_connections.get(driver_id)
-        if ws:
+    def replaced(self, role: str, client_id: str, conn: ClientConnection) -> bool:
+        """Whether the client has reconnected here on a newer socket than conn."""
+        current = self._connections(role).get(client_id)
+        return current is not None and current is not conn
+    
+    def _track_depth(self, role: str, delta: int):
+        self._queued[role] += delta
+        metrics.set_gauge(f"ws_outbound_queue_depth_{role}", self._queued[role])
+    
+    async def _enqueue(self, role: str, client_id: str, data: Union[str, bytes], droppable: bool) -> bool:
+        """Queue a pre-serialized frame for a local socket's writer."""
+        conn = self._connections(role).get(client_id)
+        if conn is None:
+            return False
+        
+        try:
+            queued = await conn.queue.put(data, droppable, settings.WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Queue is full of ride-state messages: client is too far behind
+            await self._evict(role, client_id, conn)
+            return False
+        
+        if queued:
+            self._track_depth(role, 1)
+        return queued
+    
+    async def _write_loop(self, role: str, client_id: str, conn: ClientConnection):
+        """Drain a connection's outbound queue onto its socket."""
+        while True:
+            data = await conn.queue.get()
+            self._track_depth(role, -1)
+            
+            started = time.perf_counter()
             try:
-                await ws.send_json(payload)
-                return True
+                if isinstance(data, bytes):
+                    send = conn.websocket.send_bytes(data)
+                else:
+                    send = conn.websocket.send_text(data)
+                async with asyncio.timeout(settings.WS_SEND_TIMEOUT):
+                    await send
+            except asyncio.TimeoutError:
+                metrics.inc("ws_send_timeouts")
+                conn.send_timeouts += 1
+                print(f"⚠️ Send to {role} {client_id} timed out ({conn.send_timeouts}x)")
+                if conn.send_timeouts >= settings.WS_SEND_MAX_TIMEOUTS:
+                    await self._evict(role, client_id, conn)
+                    return
+                continue
             except Exception as e:
-                print(f"⚠️ Failed to send to driver {driver_id}: {e}")
+                print(f"⚠️ Failed to send to {role} {client_id}: {e}")
+                await self._disconnect(role, client_id, conn)
+                return
+            finally:
+                metrics.observe("ws_send_seconds", time.perf_counter() - started)
+            
+            conn.send_timeouts = 0
+    
+    async def _evict(self, role: str, client_id: str, conn: ClientConnection):
+        """Drop a socket that cannot keep up so it stops holding back others."""
+        metrics.inc("ws_evictions")
+        print(f"🚫 Evicting slow {role} {client_id}")
+        await self._disconnect(role, client_id, conn)
+        try:
+            await asyncio.wait_for(conn.websocket.close(code=1011), settings.WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+    
+    def _close_connection(self, role: str, conn: ClientConnection):
+        self._track_depth(role, -len(conn.queue))
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+    
+    async def _disconnect(self, role: str, client_id: str, conn: Optional[ClientConnection] = None) -> bool:
+        connections = self._connections(role)
+        current = connections.get(client_id)
+        if current is None or (conn is not None and current is not conn):
+            return False
+        del connections[client_id]
+        self._close_connection(role, current)
+        await self._unregister(role, client_id)
+        return True
+    
+    async def fanout_local(self, role: str, messages: Dict[str, dict]) -> int:
+        """
+        Send messages to sockets held by this node, concurrently.
+        
+        Messages are queued on each connection's outbound queue; at most
+        WS_FANOUT_CONCURRENCY enqueues wait for room at once. Recipients
+        sharing the same payload object and wire protocol share one
+        serialized copy. Returns how many messages were queued.
+        """
+        if not messages:
+            return 0
+        
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(settings.WS_FANOUT_CONCURRENCY)
+        connections = self._connections(role)
+        serialized: Dict[Tuple[int, Optional[str]], Union[str, bytes]] = {}
+        
+        async def send_one(client_id: str, payload: dict) -> bool:
+            conn = connections.get(client_id)
+            if conn is None:
                 return False
-        return False
+            key = (id(payload), conn.protocol)
+            data = serialized.get(key)
+            if data is None:
+                data = serialized[key] = wire.encode(payload, conn.protocol)
+            droppable = payload.get("type") in DROPPABLE_MESSAGE_TYPES
+            async with semaphore:
+                return await self._enqueue(role, client_id, data, droppable)
+        
+        results = await asyncio.gather(
+            *(send_one(client_id, payload) for client_id, payload in messages.items())
+        )
+        metrics.observe("ws_fanout_seconds", time.perf_counter() - started)
+        return sum(results)
+    
+    async def send_local(self, role: str, client_id: str, payload: dict) -> bool:
+        """Send to a socket held by this node; never routes elsewhere."""
+        return await self.fanout_local(role, {client_id: payload}) == 1
+    
+    async def _route_remote(self, role: str, messages: Dict[str, dict]) -> int:
+        """Publish messages for sockets held by other nodes, one publish per node."""
+        client_ids = list(messages)
+        node_ids = await redis_conn.mget([presence_key(role, client_id) for client_id in client_ids])
+        
+        by_node: Dict[str, Dict[str, dict]] = {}
+        for client_id, node_id in zip(client_ids, node_ids):
+            node_id = decode_val(node_id)
+            if node_id and node_id != NODE_ID:
+                by_node.setdefault(node_id, {})[client_id] = messages[client_id]
+        
+        routed = 0
+        for node_id, node_messages in by_node.items():
+            receivers = await redis_conn.publish(
+                node_channel(node_id),
+                orjson.dumps({"role": role, "messages": node_messages})
+            )
+            if receivers > 0:
+                routed += len(node_messages)
+        return routed
+    
+    async def _deliver(self, role: str, messages: Dict[str, dict]) -> int:
+        connections = self._connections(role)
+        local = {c: p for c, p in messages.items() if c in connections}
+        remote = {c: p for c, p in messages.items() if c not in connections}
+        
+        sent = await self.fanout_local(role, local)
+        if remote:
+            sent += await self._route_remote(role, remote)
+        return sent
+    
+    async def send_to_driver(self, driver_id: str, payload: dict):
+        """Send message to a specific driver, on this node or another."""
+        return await self._deliver("driver", {driver_id: payload}) == 1
     
     async def send_to_passenger(self, passenger_id: str, payload: dict):
-        """Send message to a specific passenger."""
-        ws = self.passenger_connections.get(passenger_id)
-        if ws:
-            try:
-                await ws.send_json(payload)
-                return True
-            except Exception as e:
-                print(f"⚠️ Failed to send to passenger {passenger_id}: {e}")
-                return False
-        return False
+        """Send message to a specific passenger, on this node or another."""
+        return await self._deliver("passenger", {passenger_id: payload}) == 1
+    
+    async def send_to_drivers(self, driver_ids: List[str], payload: dict) -> int:
+        """Send the same message to several drivers; returns how many were reached."""
+        return await self._deliver("driver", {driver_id: payload for driver_id in driver_ids})
+    
+    async def send_many_to_drivers(self, messages: Dict[str, dict]) -> int:
+        """Send a per-driver message to each driver; returns how many were reached."""
+        return await self._deliver("driver", messages)
+    
+    async def broadcast_to_local_drivers(self, payload: dict, exclude_driver_id: str = None):
+        """Send to every driver connected to this node, optionally excluding one."""
+        await self.fanout_local("driver", {
+            driver_id: payload
+            for driver_id in list(self.driver_connections)
+            if driver_id != exclude_driver_id
+        })
     
     async def broadcast_to_drivers(self, payload: dict, exclude_driver_id: str = None):
-        """Broadcast message to all connected drivers, optionally excluding one."""
-        disconnected = []
-        for driver_id, ws in list(self.driver_connections.items()):
-            if exclude_driver_id and driver_id == exclude_driver_id:
-                continue
+        """Broadcast message to all connected drivers on every node, optionally excluding one."""
+        await self.broadcast_to_local_drivers(payload, exclude_driver_id)
+        await redis_conn.publish(
+            BROADCAST_CHANNEL,
+            orjson.dumps({"origin": NODE_ID, "payload": payload, "exclude": exclude_driver_id})
+        )
+    
+    async def deliver_node_message(self, data: str):
+        """Deliver messages another node routed to sockets held here."""
+        message = orjson.loads(data)
+        await self.fanout_local(message["role"], message["messages"])
+    
+    async def deliver_broadcast(self, data: str):
+        """Deliver a driver broadcast published by another node."""
+        message = orjson.loads(data)
+        if message.get("origin") == NODE_ID:
+            return
+        await self.broadcast_to_local_drivers(message["payload"], message.get("exclude"))
+    
+    async def _refresh_presence(self):
+        while True:
+            await asyncio.sleep(settings.WS_PRESENCE_TTL / 3)
             try:
-                await ws.send_json(payload)
+                pipe = redis_conn.pipeline(transaction=False)
+                # Compare-and-expire, so a stale local socket can't take back a
+                # client that has since reconnected to another node
+                for role, client_id in self._local_clients():
+                    await refresh_presence_script(
+                        keys=[presence_key(role, client_id)],
+                        args=[NODE_ID, settings.WS_PRESENCE_TTL],
+                        client=pipe
+                    )
+                # Connected drivers count as alive even when they aren't moving
+                driver_shards.heartbeat(pipe, list(self.driver_connections), time.time())
+                await pipe.execute()
             except Exception as e:
-                print(f"⚠️ Failed to send to driver {driver_id}: {e}")
-                disconnected.append(driver_id)
-        
-        # Clean up disconnected drivers
-        for driver_id in disconnected:
-            self.driver_connections.pop(driver_id, None)
+                print(f"⚠️ Failed to refresh WebSocket presence: {e}")
+    
+    def start(self):
+        """Start keeping this node's presence entries alive."""
+        if self._presence_task is None:
+            self._presence_task = asyncio.create_task(self._refresh_presence())
+    
+    async def stop(self):
+        """Stop the presence refresher and release every local registration."""
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+            try:
+                await self._presence_task
+            except asyncio.CancelledError:
+                pass
+            self._presence_task = None
+        for driver_id in list(self.driver_connections):
+            await self.disconnect_driver(driver_id)
+        for passenger_id in list(self.passenger_connections):
+            await self.disconnect_passenger(passenger_id)
 
 
 # Global WebSocket manager instance
@@ -0,0 +1,47 @@
+"""
+Wire formats for driver location traffic.
+
+JSON text frames are the default. A client that offers the compact
+subprotocol when connecting gets fixed-layout binary frames for location
+traffic instead; every other message stays JSON.
+
+Driver -> server location frame (17 bytes):
+    <d lat> <d lon> <B status>      status: 0 available, 1 busy, 2 offline
+
+Server -> passenger driver_location_update frame (17 bytes + driver id):
+    <B 1> <d lat> <d lon> <utf-8 driver_id>
+"""
+import struct
+from typing import Optional, Tuple, Union
+
+import orjson
+
+COMPACT_SUBPROTOCOL = "cab.location.v1"
+
+LOCATION_FRAME = struct.Struct("<ddB")
+LOCATION_UPDATE_FRAME = struct.Struct("<Bdd")
+
+MSG_DRIVER_LOCATION_UPDATE = 1
+
+DRIVER_STATUSES = ("available", "busy", "offline")
+
+
+def choose_subprotocol(offered) -> Optional[str]:
+    """Pick the subprotocol to accept from those the client offered."""
+    return COMPACT_SUBPROTOCOL if COMPACT_SUBPROTOCOL in (offered or ()) else None
+
+
+def decode_location(frame: bytes) -> Tuple[float, float, str]:
+    """Decode a driver location frame into (lat, lon, status)."""
+    lat, lon, status_code = LOCATION_FRAME.unpack(frame)
+    status = DRIVER_STATUSES[status_code] if status_code < len(DRIVER_STATUSES) else "available"
+    return lat, lon, status
+
+
+def encode(payload: dict, protocol: Optional[str]) -> Union[str, bytes]:
+    """Serialize an outbound message for a connection's negotiated protocol."""
+    if protocol == COMPACT_SUBPROTOCOL and payload.get("type") == "driver_location_update":
+        return LOCATION_UPDATE_FRAME.pack(
+            MSG_DRIVER_LOCATION_UPDATE, payload["lat"], payload["lon"]
+        ) + payload["driver_id"].encode()
+    return orjson.dumps(payload).decode()
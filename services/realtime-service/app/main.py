@@ -1,30 +1,54 @@
 from fastapi import FastAPI
+from app.core.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-import threading
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.websocket import router as websocket_router
-from app.core.redis_listener import listen_to_redis
+from app.core.batch_matching import batch_matcher
+from app.core.config import settings
+from app.core.dispatch import dispatcher
+from app.core.driver_index import driver_index
+from app.core.driver_sweeper import driver_sweeper
+from app.core.location_ingest import location_ingest
+from app.core.metrics import metrics
+from app.core.redis_client import redis_pool
+from app.core.redis_listener import redis_listener
+from app.core.websocket_manager import ws_manager
 from app.api.v1.ride_request import router as ride_request_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
-    # Start Redis pub/sub listener in background thread
-    t = threading.Thread(target=listen_to_redis, daemon=True)
-    t.start()
+    # Start Redis pub/sub listener on the event loop
+    await redis_listener.start()
+    location_ingest.start()
+    ws_manager.start()
+    driver_sweeper.start()
+    if settings.RIDE_BATCH_MATCHING:
+        batch_matcher.start()
+    if settings.DRIVER_INDEX_ENABLED:
+        driver_index.start()
     print("✅ Realtime service started - Redis listener active")
     
     yield  # App is running
     
     print("🛑 Stopping realtime service...")
+    await redis_listener.stop()
+    await batch_matcher.stop()
+    await dispatcher.stop()
+    await location_ingest.stop()
+    await driver_index.stop()
+    await driver_sweeper.stop()
+    await ws_manager.stop()
+    await redis_pool.disconnect()
 
 
 app = FastAPI(
     title="Realtime Service",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -43,6 +67,10 @@ def health():
 def info():
     return {"service": "realtime-service", "version": "1.0.0"}
 
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
 @app.get("/api/v1")
 def root():
     return {"message": "Realtime Service API v1"}
@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class RideAssignedEvent(BaseModel):
+    type: str = "ride_assigned"
+    request_id: str
+    driver_id: str
+    passenger_id: str
+    pickup_lat: float
+    pickup_lon: float
+
+
+class RideCancelledEvent(BaseModel):
+    type: str = "ride_cancelled"
+    request_id: str
+    driver_id: Optional[str] = None
+    passenger_id: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class LocationForwardEvent(BaseModel):
+    type: str = "location_forward"
+    driver_id: str
+    passenger_id: str
+    lat: float
+    lon: float
+
+
+class BroadcastEvent(BaseModel):
+    type: str = "broadcast"
+    payload: dict
+    exclude_driver_id: Optional[str] = None
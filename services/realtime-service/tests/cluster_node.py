@@ -0,0 +1,65 @@
+"""
+One realtime-service node for the multi-process delivery test.
+
+Run as `python tests/cluster_node.py holder|sender <passenger_id>` with
+REDIS_HOST, REDIS_PORT and NODE_ID set. The holder keeps the passenger's
+socket and prints the first message it receives; the sender delivers a
+message to that passenger from its own process and prints whether it was
+routed. Both print "ready" once their listener is subscribed, and their
+result on a line starting with "result"; the service's own logging is
+printed around them.
+"""
+import asyncio
+import sys
+
+import orjson
+
+from app.core import redis_client
+from app.core.redis_listener import redis_listener
+from app.core.websocket_manager import presence_key, ws_manager
+
+
+class NodeWebSocket:
+    """A passenger socket that hands its messages to the test over stdout."""
+    
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.received = asyncio.Queue()
+    
+    async def accept(self, subprotocol=None):
+        pass
+    
+    async def send_text(self, data):
+        await self.received.put(data)
+    
+    async def close(self, code=1000):
+        pass
+
+
+async def hold(passenger_id: str):
+    websocket = NodeWebSocket()
+    await ws_manager.connect_passenger(passenger_id, websocket)
+    print("ready", flush=True)
+    message = await asyncio.wait_for(websocket.received.get(), timeout=10)
+    print("result", message if isinstance(message, str) else message.decode(), flush=True)
+    await ws_manager.disconnect_passenger(passenger_id)
+
+
+async def send(passenger_id: str):
+    print("ready", flush=True)
+    # The holder registers its presence before it reports ready
+    assert await redis_client.redis_conn.exists(presence_key("passenger", passenger_id))
+    delivered = await ws_manager.send_to_passenger(passenger_id, {"type": "driver_assigned", "driver_id": "d1"})
+    print("result", orjson.dumps({"delivered": delivered}).decode(), flush=True)
+
+
+async def main(role: str, passenger_id: str):
+    await redis_listener.start()
+    try:
+        await (hold if role == "holder" else send)(passenger_id)
+    finally:
+        await redis_listener.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*sys.argv[1:3]))
@@ -0,0 +1,59 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core import redis_client
+
+# Swapped in before any module binds redis_conn, so scripts register against it too
+redis_client.redis_conn = fakeredis.FakeAsyncRedis()
+
+from app.core.driver_shards import driver_shards  # noqa: E402
+from app.core.ride_cache import ride_cache  # noqa: E402
+from app.core.websocket_manager import ws_manager  # noqa: E402
+
+
+class FakeWebSocket:
+    """Just enough of a Starlette WebSocket for WebSocketManager and the endpoints."""
+    
+    def __init__(self, incoming=()):
+        self.scope = {"subprotocols": []}
+        self.incoming = list(incoming)
+        self.sent = []
+        self.closed = None
+    
+    async def receive(self):
+        """Next queued client message; the client hangs up once they run out."""
+        await asyncio.sleep(0)
+        if not self.incoming:
+            return {"type": "websocket.disconnect", "code": 1000}
+        return {"type": "websocket.receive", "text": self.incoming.pop(0)}
+    
+    async def accept(self, subprotocol=None):
+        pass
+    
+    async def send_text(self, data):
+        self.sent.append(data)
+    
+    async def send_bytes(self, data):
+        self.sent.append(data)
+    
+    async def close(self, code=1000):
+        self.closed = code
+
+
+@pytest.fixture
+def redis():
+    """The shared fake Redis, emptied before each test."""
+    asyncio.run(redis_client.redis_conn.flushall())
+    return redis_client.redis_conn
+
+
+@pytest.fixture
+def websocket():
+    """Factory for fake sockets; node-local connection state starts empty."""
+    ws_manager.driver_connections.clear()
+    ws_manager.passenger_connections.clear()
+    driver_shards.__init__()
+    ride_cache.__init__()
+    return FakeWebSocket
@@ -0,0 +1,77 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from app.core.assignment import haversine_matrix, solve_assignment
+
+
+def brute_force_cost(cost: np.ndarray) -> float:
+    """Optimal total cost, trying every way to match the shorter side."""
+    n, m = cost.shape
+    if n > m:
+        return brute_force_cost(cost.T)
+    return min(cost[np.arange(n), list(cols)].sum() for cols in itertools.permutations(range(m), n))
+
+
+def assigned_cost(cost: np.ndarray, assignment: np.ndarray) -> float:
+    rows = np.flatnonzero(assignment >= 0)
+    cols = assignment[rows]
+    # Every row or every column is matched, each column at most once
+    assert len(rows) == min(cost.shape)
+    assert len(set(cols.tolist())) == len(cols)
+    return float(cost[rows, cols].sum())
+
+
+def greedy_cost(cost: np.ndarray) -> float:
+    """First come, first served: each row takes the nearest column still free."""
+    free = np.ones(cost.shape[1], dtype=bool)
+    total = 0.0
+    for row in cost[:min(cost.shape)]:
+        j = int(np.argmin(np.where(free, row, np.inf)))
+        free[j] = False
+        total += row[j]
+    return total
+
+
+def surge_batch(requests: int, drivers: int, seed: int = 0) -> np.ndarray:
+    """Pickup distances for requests and drivers scattered over a ~10 km city."""
+    rng = np.random.default_rng(seed)
+    req = rng.uniform(0, 0.1, (requests, 2)) + (27.47, 89.63)
+    drv = rng.uniform(0, 0.1, (drivers, 2)) + (27.47, 89.63)
+    return haversine_matrix(req[:, 0], req[:, 1], drv[:, 0], drv[:, 1])
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (2, 6), (6, 2), (4, 7), (7, 4), (5, 5)])
+def test_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        cost = rng.uniform(0, 10, shape)
+        assert assigned_cost(cost, solve_assignment(cost)) == pytest.approx(brute_force_cost(cost))
+
+
+def test_empty():
+    assert solve_assignment(np.zeros((0, 3))).shape == (0,)
+    assert (solve_assignment(np.zeros((3, 0))) == -1).all()
+
+
+@pytest.mark.parametrize("shape, budget", [
+    ((100, 100), 0.1),
+    ((1000, 1000), 2.0),
+    # Uneven batches are what a surge produces
+    ((1000, 200), 1.0),
+    ((200, 1000), 1.0),
+])
+def test_benchmark(shape, budget):
+    cost = surge_batch(*shape)
+    started = time.perf_counter()
+    assignment = solve_assignment(cost)
+    elapsed = time.perf_counter() - started
+    
+    total = assigned_cost(cost, assignment)
+    greedy = greedy_cost(cost)
+    print(f"\n{shape[0]}x{shape[1]}: solve {elapsed * 1000:.1f} ms, "
+          f"pickup {total:.1f} km (greedy {greedy:.1f} km)")
+    assert total <= greedy + 1e-6
+    assert elapsed < budget
@@ -0,0 +1,156 @@
+import asyncio
+import random
+import statistics
+import time
+
+import pytest
+
+from app.core.dispatch import find_available_drivers
+from app.core.driver_index import GEO_LAT_MAX, GEO_LAT_MIN, GEO_STEP, DriverIndex, decode_geo_score
+from app.core.driver_shards import available_key, geo_key
+from app.core.metrics import metrics
+
+CENTER = (27.47, 89.63)
+
+
+def _spread(x: int) -> int:
+    """Interleave zeros between the low 32 bits (inverse of driver_index._squash)."""
+    x &= 0xFFFFFFFF
+    x = (x | (x << 16)) & 0x0000FFFF0000FFFF
+    x = (x | (x << 8)) & 0x00FF00FF00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x << 2)) & 0x3333333333333333
+    x = (x | (x << 1)) & 0x5555555555555555
+    return x
+
+
+def geo_score(lon: float, lat: float) -> int:
+    """The sorted-set score real Redis stores for GEOADD lon lat."""
+    cells = 1 << GEO_STEP
+    lat_cell = int((lat - GEO_LAT_MIN) / (GEO_LAT_MAX - GEO_LAT_MIN) * cells)
+    lon_cell = int((lon + 180) / 360 * cells)
+    return _spread(lat_cell) | (_spread(lon_cell) << 1)
+
+
+def fleet(count: int, spread: float, seed: int = 0):
+    """(driver_id, lon, lat, available) scattered over +-spread degrees; about two in three available."""
+    rng = random.Random(seed)
+    return [
+        (f"d{i}", CENTER[1] + rng.uniform(-spread, spread), CENTER[0] + rng.uniform(-spread, spread),
+         rng.random() < 0.66)
+        for i in range(count)
+    ]
+
+
+async def add_to_redis(redis, drivers):
+    pipe = redis.pipeline(transaction=False)
+    for driver_id, lon, lat, available in drivers:
+        pipe.geoadd(geo_key(""), (lon, lat, driver_id))
+        if available:
+            pipe.sadd(available_key(""), driver_id)
+    await pipe.execute()
+
+
+def add_to_index(index: DriverIndex, drivers):
+    """Feed the index the way location flushes and availability changes do."""
+    for driver_id, lon, lat, available in drivers:
+        index.update(driver_id, lon, lat)
+        index.set_available(driver_id, available)
+    index.ready = True
+
+
+def query_points(count: int, spread: float, seed: int = 1):
+    rng = random.Random(seed)
+    return [(CENTER[0] + rng.uniform(-spread, spread), CENTER[1] + rng.uniform(-spread, spread))
+            for _ in range(count)]
+
+
+def assert_same_nearest(found, expected, tolerance_km=0.002):
+    """
+    Same drivers at the same distances, up to GEO position rounding.
+    
+    Redis keeps positions to ~0.6 m, so drivers that close to the cut-off
+    (the radius, or the limit-th distance) may fall on either side of it.
+    """
+    found_distances, expected_distances = dict(found), dict(expected)
+    assert len(found_distances) == len(found)
+    cutoff = min(found[-1][1], expected[-1][1]) - tolerance_km if found and expected else 0
+    for driver_id in found_distances.keys() ^ expected_distances.keys():
+        assert found_distances.get(driver_id, expected_distances.get(driver_id)) >= cutoff, driver_id
+    for driver_id in found_distances.keys() & expected_distances.keys():
+        assert found_distances[driver_id] == pytest.approx(expected_distances[driver_id], abs=tolerance_km)
+
+
+def test_decodes_redis_geo_scores():
+    for lon, lat in ((89.63, 27.47), (-122.42, 37.77), (0.0, 0.0), (151.2, -33.87)):
+        assert decode_geo_score(geo_score(lon, lat)) == pytest.approx((lon, lat), abs=1e-5)
+
+
+def test_nearest_matches_drivers_geo(redis):
+    async def scenario():
+        drivers = fleet(2000, spread=0.1)
+        await add_to_redis(redis, drivers)
+        index = DriverIndex(cell_km=0.5, sync_interval=60)
+        add_to_index(index, drivers)
+        
+        for lat, lon in query_points(20, spread=0.1):
+            for radius_km, limit in ((1, 3), (2, 10), (5, 20)):
+                expected = await find_available_drivers(lat, lon, radius_km, limit)
+                found = index.nearest(lat, lon, radius_km, limit)
+                assert_same_nearest(found, expected)
+    
+    asyncio.run(scenario())
+
+
+def test_sync_reports_drift_from_redis(redis):
+    async def set_position(driver_id, lon, lat):
+        # GEOADD as real Redis stores it; fakeredis keeps GEO scores as strings
+        await redis.zadd(geo_key(""), {driver_id: geo_score(lon, lat)})
+    
+    async def scenario():
+        for driver_id, lon, lat, available in fleet(100, spread=0.05):
+            await set_position(driver_id, lon, lat)
+            if available:
+                await redis.sadd(available_key(""), driver_id)
+        index = DriverIndex(cell_km=0.5, sync_interval=60)
+        await index.sync()
+        assert len(index) == 100
+        
+        # Changes made on other nodes, which this index hasn't seen yet
+        await set_position("d0", CENTER[1], CENTER[0] + 0.01)
+        await redis.zrem(geo_key(""), "d1")
+        await set_position("new", CENTER[1], CENTER[0])
+        await index.sync()
+        assert metrics.gauges["driver_index_missing"] == 1
+        assert metrics.gauges["driver_index_extra"] == 1
+        assert metrics.gauges["driver_index_max_drift_km"] > 0
+        assert len(index) == 100
+        
+        await index.sync()
+        assert metrics.gauges["driver_index_missing"] == 0
+        assert metrics.gauges["driver_index_extra"] == 0
+        assert metrics.gauges["driver_index_max_drift_km"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_benchmark_at_50k_drivers():
+    # ~30 x 30 km metro area
+    drivers = fleet(50000, spread=0.15)
+    index = DriverIndex(cell_km=0.5, sync_interval=60)
+    started = time.perf_counter()
+    add_to_index(index, drivers)
+    build_seconds = time.perf_counter() - started
+    
+    times = []
+    for lat, lon in query_points(1000, spread=0.15):
+        started = time.perf_counter()
+        index.nearest(lat, lon, 5, 10)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    median, p99 = statistics.median(times), times[int(len(times) * 0.99) - 1]
+    print(f"\n50k drivers: build {build_seconds * 1000:.0f} ms; nearest 10 within 5 km: "
+          f"median {median * 1e6:.0f} us, p99 {p99 * 1e6:.0f} us")
+    # Cheaper than the same-zone network round trip a GEOSEARCH would cost
+    assert median < 0.0005
+    assert p99 < 0.002
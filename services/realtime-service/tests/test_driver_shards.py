@@ -0,0 +1,66 @@
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.core.dispatch import find_available_drivers
+from app.core.driver_shards import available_key, geo_key, shard_of
+
+# Query city first; the rest only add to the worldwide fleet
+CITIES = [
+    (27.47, 89.63), (51.51, -0.13), (40.71, -74.01), (35.68, 139.69),
+    (-23.55, -46.63), (19.08, 72.88), (-33.87, 151.21), (30.04, 31.24),
+    (55.76, 37.62), (1.35, 103.82), (6.52, 3.38), (37.77, -122.42),
+    (-34.60, -58.38), (41.01, 28.98), (13.76, 100.50), (48.86, 2.35),
+]
+DRIVERS_PER_CITY = 500
+
+
+async def add_fleet(redis, cities, precision: int, seed: int = 0):
+    """Write every driver to both the global keys and its geohash shard's keys."""
+    rng = random.Random(seed)
+    pipe = redis.pipeline(transaction=False)
+    for c, (lat, lon) in enumerate(cities):
+        for i in range(DRIVERS_PER_CITY):
+            driver_id = f"c{c}-d{i}"
+            d_lat, d_lon = lat + rng.uniform(-0.1, 0.1), lon + rng.uniform(-0.1, 0.1)
+            shard = shard_of(d_lon, d_lat) if precision else ""
+            for key_shard in {"", shard}:
+                pipe.geoadd(geo_key(key_shard), (d_lon, d_lat, driver_id))
+                pipe.sadd(available_key(key_shard), driver_id)
+    await pipe.execute()
+
+
+def test_benchmark_query_time_against_fleet_size(redis, monkeypatch):
+    precision = 4
+    rng = random.Random(1)
+    points = [(CITIES[0][0] + rng.uniform(-0.08, 0.08), CITIES[0][1] + rng.uniform(-0.08, 0.08))
+              for _ in range(5)]
+    
+    async def query(shard_precision: int):
+        monkeypatch.setattr(settings, "DRIVER_SHARD_PRECISION", shard_precision)
+        results, times = [], []
+        for lat, lon in points:
+            started = time.perf_counter()
+            results.append(await find_available_drivers(lat, lon, 5, 10))
+            times.append(time.perf_counter() - started)
+        return results, statistics.median(times)
+    
+    async def measure(cities: int):
+        await redis.flushall()
+        monkeypatch.setattr(settings, "DRIVER_SHARD_PRECISION", precision)
+        await add_fleet(redis, CITIES[:cities], precision)
+        unsharded, unsharded_time = await query(0)
+        sharded, sharded_time = await query(precision)
+        assert sharded == unsharded
+        assert all(unsharded)
+        return unsharded_time, sharded_time
+    
+    results = {cities: asyncio.run(measure(cities)) for cities in (1, 4, 16)}
+    for cities, (unsharded_time, sharded_time) in results.items():
+        print(f"\n{cities * DRIVERS_PER_CITY} drivers ({DRIVERS_PER_CITY} per city): "
+              f"unsharded {unsharded_time * 1000:.2f} ms, sharded {sharded_time * 1000:.2f} ms")
+    # A query only reads its own region's shards, however big the fleet gets
+    assert results[16][1] < results[1][1] * 3
+    assert results[16][1] < results[16][0]
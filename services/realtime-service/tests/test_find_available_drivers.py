@@ -0,0 +1,86 @@
+import asyncio
+import random
+import time
+
+from app.core import redis_client
+from app.core.dispatch import find_available_drivers
+from app.core.driver_shards import available_key, geo_key
+from app.core.redis_client import decode_val
+
+CENTER = (27.47, 89.63)
+# Same-zone network round trip, added to every command the fake Redis serves
+SIMULATED_RTT = 0.0005
+
+
+async def add_drivers(redis, count: int, available_share: float, seed: int = 0):
+    rng = random.Random(seed)
+    pipe = redis.pipeline(transaction=False)
+    for i in range(count):
+        lat = CENTER[0] + rng.uniform(-0.05, 0.05)
+        lon = CENTER[1] + rng.uniform(-0.05, 0.05)
+        pipe.geoadd(geo_key(""), (lon, lat, f"d{i}"))
+        if rng.random() < available_share:
+            pipe.sadd(available_key(""), f"d{i}")
+    await pipe.execute()
+
+
+async def find_with_sismember_loop(redis, lat, lon, radius_km, limit):
+    """The pre-script candidate selection: one SISMEMBER round trip per nearby driver."""
+    nearby = await redis.georadius(geo_key(""), lon, lat, radius_km, unit="km", withdist=True, sort="ASC")
+    result = []
+    for raw_id, dist in nearby:
+        if await redis.sismember(available_key(""), raw_id):
+            result.append((decode_val(raw_id), float(dist)))
+            if len(result) >= limit:
+                break
+    return result
+
+
+def count_round_trips(monkeypatch, redis) -> dict:
+    """Count commands sent to Redis, each delayed by the simulated round trip."""
+    counter = {"round_trips": 0}
+    execute = redis.execute_command
+    
+    async def execute_command(*args, **kwargs):
+        counter["round_trips"] += 1
+        await asyncio.sleep(SIMULATED_RTT)
+        return await execute(*args, **kwargs)
+    
+    monkeypatch.setattr(redis, "execute_command", execute_command)
+    return counter
+
+
+def test_returns_only_available_drivers_nearest_first(redis):
+    async def scenario():
+        await add_drivers(redis, 200, available_share=0.5)
+        found = await find_available_drivers(*CENTER, 10, 20)
+        expected = await find_with_sismember_loop(redis, *CENTER, 10, 20)
+        assert found == expected
+        assert len(found) == 20
+        assert [dist for _, dist in found] == sorted(dist for _, dist in found)
+    
+    asyncio.run(scenario())
+
+
+def test_benchmark_against_the_sismember_loop(redis, monkeypatch):
+    async def measure(find):
+        await add_drivers(redis, 300, available_share=0.5)
+        counter = count_round_trips(monkeypatch, redis_client.redis_conn)
+        latencies = []
+        for _ in range(30):
+            started = time.perf_counter()
+            await find(*CENTER, 10, 20)
+            latencies.append(time.perf_counter() - started)
+        monkeypatch.undo()
+        latencies.sort()
+        return counter["round_trips"] / 30, latencies[int(len(latencies) * 0.99) - 1]
+    
+    script_trips, script_p99 = asyncio.run(measure(find_available_drivers))
+    loop_trips, loop_p99 = asyncio.run(
+        measure(lambda *args: find_with_sismember_loop(redis_client.redis_conn, *args))
+    )
+    print(f"\nscript: {script_trips:.0f} round trips, p99 {script_p99 * 1000:.1f} ms; "
+          f"SISMEMBER loop: {loop_trips:.0f} round trips, p99 {loop_p99 * 1000:.1f} ms")
+    assert script_trips == 1
+    assert loop_trips > 20
+    assert script_p99 < loop_p99
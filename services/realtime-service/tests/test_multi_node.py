@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+import orjson
+import pytest
+from fakeredis import TcpFakeServer
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def redis_address():
+    """
+    A Redis both node processes can reach.
+    
+    Set REDIS_TEST_HOST/REDIS_TEST_PORT to run against a real local Redis;
+    otherwise a fakeredis TCP server is started in a thread.
+    """
+    if os.environ.get("REDIS_TEST_HOST"):
+        address = (os.environ["REDIS_TEST_HOST"], int(os.environ.get("REDIS_TEST_PORT", 6379)))
+        try:
+            Redis(*address).ping()
+        except RedisConnectionError:
+            pytest.skip(f"no Redis at {address[0]}:{address[1]}")
+        yield address
+        return
+    
+    server = TcpFakeServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def start_node(address, node_id: str, role: str, passenger_id: str) -> subprocess.Popen:
+    env = {**os.environ, "REDIS_HOST": address[0], "REDIS_PORT": str(address[1]), "NODE_ID": node_id}
+    node = subprocess.Popen(
+        [sys.executable, "tests/cluster_node.py", role, passenger_id],
+        cwd=SERVICE_DIR, env={**env, "PYTHONPATH": str(SERVICE_DIR)},
+        stdout=subprocess.PIPE, text=True
+    )
+    for line in node.stdout:
+        if line.strip() == "ready":
+            return node
+    pytest.fail(f"{node_id} exited before it was ready")
+
+
+def node_output(node: subprocess.Popen) -> dict:
+    """The node's result, once it has exited cleanly."""
+    stdout, _ = node.communicate(timeout=15)
+    assert node.returncode == 0
+    results = [line.split(" ", 1)[1] for line in stdout.splitlines() if line.startswith("result ")]
+    return orjson.loads(results[-1])
+
+
+def test_message_reaches_a_passenger_on_another_node(redis_address):
+    passenger_id = f"p-{uuid.uuid4()}"
+    holder = start_node(redis_address, "node-a", "holder", passenger_id)
+    try:
+        sender = start_node(redis_address, "node-b", "sender", passenger_id)
+        assert node_output(sender) == {"delivered": True}
+        assert node_output(holder) == {"type": "driver_assigned", "driver_id": "d1"}
+    finally:
+        holder.kill()
@@ -0,0 +1,92 @@
+import asyncio
+import statistics
+import time
+
+import orjson
+
+from app.api.v1.websocket import handle_driver_accept
+from app.core.config import settings
+from app.core.websocket_manager import ws_manager
+
+DRIVERS = 100
+
+
+def test_one_of_many_racing_drivers_wins(redis, websocket):
+    async def scenario():
+        await redis.hset("ride_request:r1", mapping={
+            "passenger_id": "p1", "pickup_lat": 27.47, "pickup_lon": 89.63,
+            "status": "pending", "created_at": 0,
+        })
+        await redis.set("ride_request:passenger:p1", "r1")
+        passenger = websocket()
+        await ws_manager.connect_passenger("p1", passenger)
+        drivers = {f"d{i}": websocket() for i in range(DRIVERS)}
+        for driver_id, socket in drivers.items():
+            await ws_manager.connect_driver(driver_id, socket)
+        
+        await asyncio.gather(*(handle_driver_accept(driver_id, "r1") for driver_id in drivers))
+        await asyncio.sleep(0.1)  # let the writer tasks drain
+        
+        received = {
+            driver_id: [orjson.loads(frame)["type"] for frame in socket.sent]
+            for driver_id, socket in drivers.items()
+        }
+        winners = [driver_id for driver_id, types in received.items() if types == ["ride_confirmed"]]
+        losers = [driver_id for driver_id, types in received.items() if types == ["ride_taken"]]
+        assert len(winners) == 1
+        assert len(losers) == DRIVERS - 1
+        
+        winner = winners[0]
+        assert [orjson.loads(frame) for frame in passenger.sent] == [{
+            "type": "driver_assigned", "driver_id": winner, "pickup_lat": 27.47, "pickup_lon": 89.63,
+        }]
+        assert await redis.hget("ride_request:r1", "driver_id") == winner.encode()
+        assert await redis.hget("ride:driver:" + winner, "passenger_id") == b"p1"
+        assert await redis.hget("ride:passenger:p1", "driver_id") == winner.encode()
+        assert await redis.get("ride_request:passenger:p1") is None
+        events = await redis.xrange(settings.RIDE_EVENTS_STREAM)
+        assert [fields[b"type"] for _, fields in events] == [b"assigned"]
+    
+    asyncio.run(scenario())
+
+
+async def pending_request(redis, request_id: str, offered: list):
+    await redis.hset(f"ride_request:{request_id}", mapping={
+        "passenger_id": f"p-{request_id}", "pickup_lat": 27.47, "pickup_lon": 89.63,
+        "status": "pending", "created_at": 0,
+    })
+    await redis.sadd(f"ride_request:{request_id}:drivers", *offered)
+
+
+def test_benchmark_accept_latency_against_connected_drivers(redis, websocket):
+    offered, accepts = 5, 20
+    
+    async def measure(connected: int):
+        ws_manager.driver_connections.clear()
+        for i in range(connected):
+            await ws_manager.connect_driver(f"d{i}", websocket())
+        
+        targeted = []
+        for n in range(accepts):
+            request_id = f"r{connected}-{n}"
+            drivers = [f"d{(n * offered + k) % connected}" for k in range(offered)]
+            await pending_request(redis, request_id, drivers)
+            started = time.perf_counter()
+            await handle_driver_accept(drivers[0], request_id)
+            targeted.append(time.perf_counter() - started)
+        
+        # What accepting used to cost: ride_taken to every connected driver
+        broadcast = []
+        for _ in range(3):
+            started = time.perf_counter()
+            await ws_manager.broadcast_to_local_drivers({"type": "ride_taken"}, "d0")
+            broadcast.append(time.perf_counter() - started)
+        return statistics.median(targeted), statistics.median(broadcast)
+    
+    results = {connected: asyncio.run(measure(connected)) for connected in (100, 1000, 10000)}
+    for connected, (targeted, broadcast) in results.items():
+        print(f"\n{connected} drivers connected: accept {targeted * 1000:.2f} ms, "
+              f"broadcast ride_taken {broadcast * 1000:.2f} ms")
+    # Only the offered drivers are told, so accepting doesn't grow with the fleet
+    assert results[10000][0] < results[100][0] * 3
+    assert results[10000][0] < results[10000][1]
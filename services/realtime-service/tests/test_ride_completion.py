@@ -0,0 +1,79 @@
+import asyncio
+
+import orjson
+
+from app.api.v1.websocket import handle_ride_completion
+from app.core.config import settings
+from app.core.websocket_manager import ws_manager
+
+RIDE = {
+    "passenger_id": "p1", "driver_id": "d1", "pickup_lat": "27.47", "pickup_lon": "89.63",
+    "status": "assigned", "created_at": "100.0",
+}
+
+
+async def assigned_ride(redis, websocket, **overrides):
+    await redis.hset("ride_request:r1", mapping={**RIDE, **overrides})
+    await redis.hset("ride:driver:d1", mapping={"request_id": "r1", "passenger_id": "p1"})
+    await redis.hset("ride:passenger:p1", mapping={"request_id": "r1", "driver_id": "d1"})
+    driver, passenger = websocket(), websocket()
+    await ws_manager.connect_driver("d1", driver)
+    await ws_manager.connect_passenger("p1", passenger)
+    return driver, passenger
+
+
+async def completed_events(redis):
+    events = await redis.xrange(settings.RIDE_EVENTS_STREAM)
+    return [{k.decode(): v.decode() for k, v in fields.items()} for _, fields in events]
+
+
+def test_completion_clears_state_and_records_the_ride(redis, websocket):
+    async def scenario():
+        driver, passenger = await assigned_ride(redis, websocket)
+        await handle_ride_completion("d1", "r1")
+        await asyncio.sleep(0.01)
+        
+        for key in ("ride_request:r1", "ride:driver:d1", "ride:passenger:p1"):
+            assert not await redis.exists(key)
+        assert await redis.smembers("available_drivers") == {b"d1"}
+        assert [orjson.loads(frame)["type"] for frame in driver.sent] == ["ride_completed_ack"]
+        assert [orjson.loads(frame)["type"] for frame in passenger.sent] == ["ride_completed"]
+        
+        [event] = await completed_events(redis)
+        assert event["type"] == "completed"
+        assert {k: event[k] for k in ("request_id", "driver_id", "passenger_id", "pickup_lat",
+                                      "pickup_lon", "created_at")} == {
+            "request_id": "r1", "driver_id": "d1", "passenger_id": "p1",
+            "pickup_lat": "27.47", "pickup_lon": "89.63", "created_at": "100.0",
+        }
+        assert float(event["completed_at"]) > 100
+    
+    asyncio.run(scenario())
+
+
+def test_retry_after_a_failed_cleanup_still_records_the_completion(redis, websocket):
+    async def scenario():
+        # The script ran but the cleanup pipeline never did
+        await assigned_ride(redis, websocket, status="completed", completed_at="200.0")
+        await handle_ride_completion("d1", "r1")
+        
+        [event] = await completed_events(redis)
+        assert event["completed_at"] == "200.0"
+        assert not await redis.exists("ride_request:r1")
+    
+    asyncio.run(scenario())
+
+
+def test_only_the_assigned_driver_can_complete(redis, websocket):
+    async def scenario():
+        await assigned_ride(redis, websocket)
+        other = websocket()
+        await ws_manager.connect_driver("d2", other)
+        await handle_ride_completion("d2", "r1")
+        await asyncio.sleep(0.01)
+        
+        assert [orjson.loads(frame)["type"] for frame in other.sent] == ["error"]
+        assert await redis.hget("ride_request:r1", "status") == b"assigned"
+        assert await completed_events(redis) == []
+    
+    asyncio.run(scenario())
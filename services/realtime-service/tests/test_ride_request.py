@@ -0,0 +1,32 @@
+import asyncio
+
+from app.api.v1.ride_request import request_ride
+from app.core import redis_client
+from app.schemas.ride import RideRequest
+
+REQUEST = RideRequest(passenger_id="p1", lat=27.47, lon=89.63)
+
+
+def test_pending_request_is_reported(redis):
+    async def scenario():
+        await redis.set("ride_request:passenger:p1", "r0")
+        assert await request_ride(REQUEST) == {"status": "already_requested", "request_id": "r0"}
+    
+    asyncio.run(scenario())
+
+
+def test_claim_is_retried_when_the_pending_request_expires_meanwhile(redis, monkeypatch):
+    async def scenario():
+        await redis.set("ride_request:passenger:p1", "r0")
+        get = redis.get
+        
+        async def get_after_expiry(key):
+            await redis.delete(key)  # the TTL runs out between SET NX and GET
+            return await get(key)
+        
+        monkeypatch.setattr(redis_client.redis_conn, "get", get_after_expiry)
+        # Claimed on the second try, then no driver is around to offer it to
+        assert await request_ride(REQUEST) == {"status": "no_drivers_available"}
+        assert await redis.exists("ride_request:passenger:p1") == 0
+    
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.api.v1.websocket import _driver_gone
+from app.core.driver_shards import driver_shards
+from app.core.websocket_manager import NODE_ID, presence_key, ws_manager
+
+
+def test_closing_a_replaced_socket_keeps_the_new_connection(redis, websocket):
+    async def scenario():
+        old = await ws_manager.connect_driver("d1", websocket())
+        await driver_shards.connect("d1")
+        new = await ws_manager.connect_driver("d1", websocket())
+        await driver_shards.connect("d1")
+        
+        # The old handler sees its socket close after the reconnect
+        await _driver_gone("d1", old)
+        
+        assert ws_manager.driver_connections["d1"] is new
+        assert await redis.get(presence_key("driver", "d1")) == NODE_ID.encode()
+        assert await redis.smembers("available_drivers") == {b"d1"}
+        
+        await _driver_gone("d1", new)
+        assert "d1" not in ws_manager.driver_connections
+        assert await redis.get(presence_key("driver", "d1")) is None
+        assert await redis.smembers("available_drivers") == set()
+    
+    asyncio.run(scenario())
+
+
+def test_disconnect_stops_a_writer_that_is_mid_send(redis, websocket):
+    async def scenario():
+        conn = await ws_manager.connect_driver("d1", websocket())
+        await ws_manager.send_to_driver("d1", {"type": "ride_taken"})
+        await asyncio.sleep(0)  # the writer picks the frame up and starts sending
+        
+        await ws_manager.disconnect_driver("d1", conn)
+        await asyncio.sleep(0.01)
+        assert conn.writer.done()
+    
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import orjson
+
+from app.api.v1.websocket import driver_websocket
+from app.core import redis_client
+from app.core.location_ingest import location_ingest
+
+CENTER = (27.47, 89.63)
+# Same-zone network round trip, added to every command the fake Redis serves
+SIMULATED_RTT = 0.0005
+
+
+def simulate_round_trips(monkeypatch, redis, blocking: bool):
+    """
+    Delay every Redis command by the simulated round trip.
+    
+    A blocking delay holds the event loop for the whole round trip, which is
+    what the synchronous client did when called from async handlers.
+    """
+    execute = redis.execute_command
+    
+    async def execute_command(*args, **kwargs):
+        if blocking:
+            time.sleep(SIMULATED_RTT)
+        else:
+            await asyncio.sleep(SIMULATED_RTT)
+        return await execute(*args, **kwargs)
+    
+    monkeypatch.setattr(redis, "execute_command", execute_command)
+
+
+def location_messages(i: int, count: int) -> list:
+    return [
+        orjson.dumps({"lat": CENTER[0] + i * 1e-4, "lon": CENTER[1] + n * 1e-4, "status": "available"}).decode()
+        for n in range(count)
+    ]
+
+
+def test_concurrent_driver_throughput(redis, websocket, monkeypatch):
+    # Under the fake Redis pool limit of 100 connections
+    drivers, messages = 50, 40
+    
+    async def run_drivers(blocking: bool) -> float:
+        simulate_round_trips(monkeypatch, redis_client.redis_conn, blocking)
+        submitted = 0
+        submit = location_ingest.submit
+        
+        def count_submit(*args):
+            nonlocal submitted
+            submitted += 1
+            submit(*args)
+        
+        monkeypatch.setattr(location_ingest, "submit", count_submit)
+        monkeypatch.setattr(location_ingest, "flush_interval", 0.01)
+        location_ingest.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            driver_websocket(websocket(location_messages(i, messages)), f"d{i}")
+            for i in range(drivers)
+        ))
+        elapsed = time.perf_counter() - started
+        await location_ingest.stop()
+        monkeypatch.undo()
+        assert submitted == drivers * messages
+        return drivers * messages / elapsed
+    
+    blocking_rate = asyncio.run(run_drivers(blocking=True))
+    async_rate = asyncio.run(run_drivers(blocking=False))
+    print(f"\n{drivers} drivers x {messages} updates: blocking client {blocking_rate:.0f} msg/s, "
+          f"async client {async_rate:.0f} msg/s")
+    assert async_rate > blocking_rate * 2
@@ -0,0 +1,60 @@
+import json
+import timeit
+
+import orjson
+
+from app.core import wire
+
+LOCATION = {"lat": 27.472813, "lon": 89.639121, "status": "busy"}
+UPDATE = {"type": "driver_location_update", "driver_id": "6f1c1c52-7a8f-4c53-9a4e-0a4b1f3b2c11",
+          "lat": 27.472813, "lon": 89.639121}
+
+
+def compact_location(lat: float, lon: float, status: str) -> bytes:
+    return wire.LOCATION_FRAME.pack(lat, lon, wire.DRIVER_STATUSES.index(status))
+
+
+def decode_json_location(frame: str, loads=orjson.loads):
+    """What driver_websocket does with a JSON location text frame."""
+    data = loads(frame)
+    return float(data.get("lat")), float(data.get("lon")), data.get("status", "available")
+
+
+def test_compact_frames_round_trip():
+    frame = compact_location(**LOCATION)
+    assert len(frame) == wire.LOCATION_FRAME.size == 17
+    assert wire.decode_location(frame) == (LOCATION["lat"], LOCATION["lon"], "busy")
+    
+    update = wire.encode(UPDATE, wire.COMPACT_SUBPROTOCOL)
+    kind, lat, lon = wire.LOCATION_UPDATE_FRAME.unpack_from(update)
+    assert (kind, lat, lon) == (wire.MSG_DRIVER_LOCATION_UPDATE, UPDATE["lat"], UPDATE["lon"])
+    assert update[wire.LOCATION_UPDATE_FRAME.size:].decode() == UPDATE["driver_id"]
+    
+    assert orjson.loads(wire.encode(UPDATE, None)) == UPDATE
+
+
+def per_message_ns(func, arg) -> float:
+    number = 20000
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number * 1e9
+
+
+def test_benchmark_encode_decode_per_message():
+    text, frame = orjson.dumps(LOCATION).decode(), compact_location(**LOCATION)
+    decode = {
+        # receive_json() parsed with the stdlib before the switch to orjson
+        "json": per_message_ns(lambda frame: decode_json_location(frame, json.loads), text),
+        "orjson": per_message_ns(decode_json_location, text),
+        "compact": per_message_ns(wire.decode_location, frame),
+    }
+    encode = {
+        "json": per_message_ns(json.dumps, UPDATE),
+        "orjson": per_message_ns(lambda payload: wire.encode(payload, None), UPDATE),
+        "compact": per_message_ns(lambda payload: wire.encode(payload, wire.COMPACT_SUBPROTOCOL), UPDATE),
+    }
+    sizes = {"json": len(text), "compact": len(frame)}
+    for name, costs in (("decode location", decode), ("encode location update", encode)):
+        print(f"\n{name}: " + ", ".join(f"{fmt} {ns:.0f} ns" for fmt, ns in costs.items()))
+    print(f"location frame: json {sizes['json']} bytes, compact {sizes['compact']} bytes")
+    assert decode["compact"] < decode["orjson"] < decode["json"]
+    assert encode["compact"] < encode["json"]
+    assert sizes["compact"] < sizes["json"]
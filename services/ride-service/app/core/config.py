@@ -0,0 +1,25 @@
+import os
+import socket
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    REDIS_HOST: str = "redis"
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 10
+    
+    # Ride events stream written by realtime-service
+    RIDE_EVENTS_STREAM: str = "ride_events"
+    RIDE_LOCATIONS_STREAM: str = "ride_locations"  # on-ride driver positions
+    RIDE_EVENTS_GROUP: str = "ride-service"
+    RIDE_EVENTS_CONSUMER: str = f"{socket.gethostname()}:{os.getpid()}"
+    RIDE_EVENTS_BATCH: int = 1000  # entries per read / Postgres transaction
+    RIDE_EVENTS_BLOCK_MS: int = 1000  # how long a read waits for new entries
+    RIDE_EVENTS_CLAIM_IDLE_MS: int = 60000  # take over entries a dead consumer left unacked
+    
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
@@ -0,0 +1,290 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.core.redis_client import redis_conn, decode_val
+from app.db.session import engine
+
+# Ride status implied by each event type; others leave the status alone
+STATUS_BY_EVENT = {
+    "requested": "pending",
+    "assigned": "assigned",
+    "completed": "completed",
+    "expired": "expired",
+}
+
+INSERT_EVENTS = """
+INSERT INTO ride_events (stream_id, type, request_id, driver_id, passenger_id, lat, lon, created_at)
+VALUES %s
+ON CONFLICT (stream_id) DO NOTHING
+RETURNING stream_id
+"""
+
+# Status only moves forward, so replays and out-of-order batches are harmless
+UPSERT_RIDES = """
+INSERT INTO rides AS r (request_id, passenger_id, driver_id, status, pickup_lat, pickup_lon,
+                        offered_count, requested_at, assigned_at, completed_at, updated_at)
+VALUES %s
+ON CONFLICT (request_id) DO UPDATE SET
+    passenger_id = COALESCE(r.passenger_id, EXCLUDED.passenger_id),
+    driver_id = COALESCE(EXCLUDED.driver_id, r.driver_id),
+    status = CASE
+        WHEN array_position(ARRAY['pending', 'assigned', 'completed', 'expired'], EXCLUDED.status)
+           > array_position(ARRAY['pending', 'assigned', 'completed', 'expired'], r.status)
+        THEN EXCLUDED.status ELSE r.status END,
+    pickup_lat = COALESCE(r.pickup_lat, EXCLUDED.pickup_lat),
+    pickup_lon = COALESCE(r.pickup_lon, EXCLUDED.pickup_lon),
+    offered_count = r.offered_count + EXCLUDED.offered_count,
+    requested_at = COALESCE(r.requested_at, EXCLUDED.requested_at),
+    assigned_at = COALESCE(r.assigned_at, EXCLUDED.assigned_at),
+    completed_at = COALESCE(r.completed_at, EXCLUDED.completed_at),
+    updated_at = now()
+"""
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse(stream_id, fields, id_prefix: str = "") -> Optional[dict]:
+    """Decode one stream entry; None if it isn't a usable event."""
+    event = {decode_val(k): decode_val(v) for k, v in fields.items()}
+    ts = _float(event.get("ts"))
+    if not event.get("type") or ts is None:
+        return None
+    event["stream_id"] = id_prefix + decode_val(stream_id)
+    event["at"] = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return event
+
+
+def _fold_rides(events: List[dict]) -> List[tuple]:
+    """Collapse a batch of events into one upsert row per ride."""
+    rides: Dict[str, dict] = {}
+    for event in events:
+        request_id = event.get("request_id")
+        if not request_id:
+            continue
+        ride = rides.setdefault(request_id, {
+            "passenger_id": None, "driver_id": None, "status": None,
+            "pickup_lat": None, "pickup_lon": None, "offered_count": 0,
+            "requested_at": None, "assigned_at": None, "completed_at": None,
+        })
+        ride["passenger_id"] = ride["passenger_id"] or event.get("passenger_id")
+        kind = event["type"]
+        if kind == "requested":
+            ride["pickup_lat"] = _float(event.get("pickup_lat"))
+            ride["pickup_lon"] = _float(event.get("pickup_lon"))
+            ride["requested_at"] = event["at"]
+        elif kind == "offered":
+            ride["offered_count"] += len([d for d in event.get("driver_ids", "").split(",") if d])
+        elif kind == "assigned":
+            ride["driver_id"] = event.get("driver_id")
+            ride["assigned_at"] = event["at"]
+        elif kind == "completed":
+            ride["driver_id"] = ride["driver_id"] or event.get("driver_id")
+            # A retried completion keeps the time of the first attempt
+            completed_at = _float(event.get("completed_at"))
+            ride["completed_at"] = (datetime.fromtimestamp(completed_at, tz=timezone.utc)
+                                    if completed_at is not None else event["at"])
+        status = STATUS_BY_EVENT.get(kind)
+        if status:
+            ride["status"] = status
+    
+    return [
+        (request_id, r["passenger_id"], r["driver_id"], r["status"] or "pending",
+         r["pickup_lat"], r["pickup_lon"], r["offered_count"],
+         r["requested_at"], r["assigned_at"], r["completed_at"], datetime.now(timezone.utc))
+        for request_id, r in rides.items()
+    ]
+
+
+def write_events(events: List[dict], update_rides: bool = True) -> int:
+    """Bulk-insert events and, with update_rides, fold the new ones into rides, in one transaction."""
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        inserted = execute_values(
+            cur, INSERT_EVENTS,
+            [
+                (e["stream_id"], e["type"], e.get("request_id"), e.get("driver_id"),
+                 e.get("passenger_id"), _float(e.get("lat")), _float(e.get("lon")), e["at"])
+                for e in events
+            ],
+            page_size=len(events),
+            fetch=True
+        )
+        # Only events not seen before update rides, so redelivery is idempotent
+        new_ids = {row[0] for row in inserted}
+        rides = _fold_rides([e for e in events if e["stream_id"] in new_ids]) if update_rides else []
+        if rides:
+            execute_values(cur, UPSERT_RIDES, rides, page_size=len(rides))
+        conn.commit()
+        return len(new_ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+class RideEventConsumer:
+    """
+    Consume the ride events stream into Postgres as part of a consumer group.
+    
+    Entries are read in batches, written with one bulk insert per table in
+    a single transaction, then acknowledged. Entries stay pending until
+    their batch commits, so a crash or database error means redelivery, not
+    loss; the insert is keyed by stream id, so redelivery is harmless.
+    Entries another consumer left pending for too long are claimed.
+    
+    id_prefix keeps stream ids unique in ride_events when more than one
+    stream is consumed into it. Without update_rides entries only go to
+    ride_events; the rides row is left to the lifecycle stream.
+    """
+    
+    def __init__(self, stream: str, group: str, consumer: str, batch_size: int, block_ms: int,
+                 id_prefix: str = "", update_rides: bool = True):
+        self.stream = stream
+        self.id_prefix = id_prefix
+        self.update_rides = update_rides
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.stats = {"received": 0, "inserted": 0, "acked": 0, "skipped": 0, "errors": 0}
+        self.last_batch_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _ensure_group(self):
+        try:
+            await redis_conn.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def _read(self, last_id: str) -> List[Tuple[bytes, dict]]:
+        response = await redis_conn.xreadgroup(
+            self.group, self.consumer, {self.stream: last_id},
+            count=self.batch_size,
+            block=None if last_id == "0" else self.block_ms
+        )
+        return response[0][1] if response else []
+    
+    async def _claim(self) -> List[Tuple[bytes, dict]]:
+        response = await redis_conn.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=settings.RIDE_EVENTS_CLAIM_IDLE_MS,
+            count=self.batch_size
+        )
+        return response[1]
+    
+    async def _process(self, entries: List[Tuple[bytes, dict]]):
+        started = time.perf_counter()
+        self.stats["received"] += len(entries)
+        events = []
+        for stream_id, fields in entries:
+            # Deleted-while-pending entries come back with no fields
+            event = _parse(stream_id, fields, self.id_prefix) if fields else None
+            if event is None:
+                self.stats["skipped"] += 1
+            else:
+                events.append(event)
+        
+        if events:
+            self.stats["inserted"] += await asyncio.to_thread(write_events, events, self.update_rides)
+        
+        await redis_conn.xack(self.stream, self.group, *[stream_id for stream_id, _ in entries])
+        self.stats["acked"] += len(entries)
+        self.last_batch_seconds = time.perf_counter() - started
+    
+    async def _run(self):
+        # Start with entries this consumer read but never acknowledged
+        last_id = "0"
+        next_claim = 0.0
+        group_ready = False
+        while True:
+            try:
+                if not group_ready:
+                    await self._ensure_group()
+                    group_ready = True
+                if time.monotonic() >= next_claim:
+                    next_claim = time.monotonic() + settings.RIDE_EVENTS_CLAIM_IDLE_MS / 1000
+                    entries = await self._claim()
+                    if entries:
+                        await self._process(entries)
+                
+                entries = await self._read(last_id)
+                if not entries:
+                    last_id = ">"
+                    continue
+                await self._process(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Ride event batch failed, will retry: {e}")
+                # Unacked entries are re-read from this consumer's pending list
+                last_id = "0"
+                group_ready = False  # cheap to re-check; recreates a deleted stream's group
+                await asyncio.sleep(1)
+    
+    async def snapshot(self) -> dict:
+        """Counters plus the group's lag and pending count from Redis."""
+        group_info = {}
+        try:
+            for info in await redis_conn.xinfo_groups(self.stream):
+                info = {decode_val(k): decode_val(v) for k, v in info.items()}
+                if info.get("name") == self.group:
+                    group_info = {"pending": info.get("pending"), "lag": info.get("lag")}
+        except ResponseError:
+            pass  # stream not created yet
+        return {
+            "stream": self.stream,
+            "consumer": self.consumer,
+            **self.stats,
+            "last_batch_seconds": round(self.last_batch_seconds, 4),
+            **group_info,
+        }
+    
+    def start(self):
+        """Start consuming in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop consuming; unfinished batches stay pending for redelivery."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global ride event consumer instances: lifecycle events and on-ride locations
+ride_event_consumer = RideEventConsumer(
+    settings.RIDE_EVENTS_STREAM,
+    settings.RIDE_EVENTS_GROUP,
+    settings.RIDE_EVENTS_CONSUMER,
+    settings.RIDE_EVENTS_BATCH,
+    settings.RIDE_EVENTS_BLOCK_MS
+)
+ride_location_consumer = RideEventConsumer(
+    settings.RIDE_LOCATIONS_STREAM,
+    settings.RIDE_EVENTS_GROUP,
+    settings.RIDE_EVENTS_CONSUMER,
+    settings.RIDE_EVENTS_BATCH,
+    settings.RIDE_EVENTS_BLOCK_MS,
+    id_prefix="loc:",
+    # A location must not create or touch a ride before its requested event lands
+    update_rides=False
+)
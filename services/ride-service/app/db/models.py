@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Float, Integer, DateTime
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class Ride(Base):
+    """One row per ride request, folded from the ride events stream."""
+    __tablename__ = "rides"
+
+    request_id = Column(String(64), primary_key=True)
+    passenger_id = Column(String(64), nullable=True, index=True)
+    driver_id = Column(String(64), nullable=True, index=True)
+    status = Column(String(20), nullable=False)  # pending, assigned, completed, expired
+
+    pickup_lat = Column(Float, nullable=True)
+    pickup_lon = Column(Float, nullable=True)
+    offered_count = Column(Integer, nullable=False, default=0)
+
+    requested_at = Column(DateTime(timezone=True), nullable=True)
+    assigned_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class RideEvent(Base):
+    """Raw lifecycle event, keyed by its Redis stream entry id."""
+    __tablename__ = "ride_events"
+
+    stream_id = Column(String(32), primary_key=True)
+    type = Column(String(20), nullable=False)
+    request_id = Column(String(64), nullable=True, index=True)
+    driver_id = Column(String(64), nullable=True, index=True)
+    passenger_id = Column(String(64), nullable=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
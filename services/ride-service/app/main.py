@@ -1,6 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from app.core.responses import ORJSONResponse
+
+from app.core.events import ride_event_consumer, ride_location_consumer
+from app.core.redis_client import redis_pool
+from app.db.migrations import run_migrations
+
 
-app = FastAPI(title="Ride Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown events."""
+    await asyncio.to_thread(run_migrations)
+    ride_event_consumer.start()
+    ride_location_consumer.start()
+    print("✅ Ride service started - consuming ride events")
+    
+    yield  # App is running
+    
+    print("🛑 Stopping ride service...")
+    await ride_event_consumer.stop()
+    await ride_location_consumer.stop()
+    await redis_pool.disconnect()
+
+
+app = FastAPI(title="Ride Service", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 @app.get("/health")
 def health():
@@ -13,3 +38,11 @@ def info():
 @app.get("/api/v1")
 def root():
     return {"message": "Ride Service API v1"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Ride event consumer counters, lag and pending entries."""
+    return {
+        "ride_events": await ride_event_consumer.snapshot(),
+        "ride_locations": await ride_location_consumer.snapshot(),
+    }